@@ -0,0 +1,159 @@
+import math
+import numpy as np
+
+
+def finite_list(values) -> list:
+    # JSON has no NaN, so values that could not be worked out are left empty.
+    return [
+        value if math.isfinite(value) else None for value in np.ravel(values).tolist()
+    ]
+
+
+# Average every complete drive period in the trace onto a common phase grid.
+# Samples are binned by (period, phase) so all of them contribute, then the
+# periods are averaged. Periods are counted from the trigger (t = 0) so folded
+# traces from different points line up.
+def fold_cycles(times, data, frequency: float, bins: int = 256) -> dict | None:
+    times = np.asarray(times, dtype=float)
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    period = 1.0 / frequency
+
+    start = times[0] + (-times[0]) % period
+    cycles = int(np.floor((times[-1] - start) / period))
+    if cycles < 1:
+        return None
+
+    position = (times - start) / period
+    inside = (position >= 0) & (position < cycles)
+    cell = (
+        np.floor(position[inside]).astype(int) * bins
+        + np.floor((position[inside] % 1.0) * bins).astype(int)
+    )
+    counts = np.bincount(cell, minlength=cycles * bins).reshape(cycles, bins)
+
+    # (channels, cycles, bins), NaN where a bin got no samples
+    binned = np.stack(
+        [
+            np.bincount(cell, weights=channel[inside], minlength=cycles * bins)
+            for channel in data
+        ]
+    ).reshape(len(data), cycles, bins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        binned = binned / counts
+
+    filled = counts > 0
+    n = filled.sum(axis=0)
+    folded = np.nansum(binned, axis=1) / np.where(n > 0, n, np.nan)
+    spread = np.nansum((binned - folded[:, None, :]) ** 2, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        error = np.sqrt(spread / (n - 1) / n)
+
+    phase = (np.arange(bins) + 0.5) / bins
+    return {"phase": phase, "mean": folded, "error": error, "cycles": cycles}
+
+
+def fold_result(result: dict, frequency: float, bins: int = 256) -> dict | None:
+    channels = ["channel1", "channel2", "channel3"]
+    folded = fold_cycles(
+        result["time"], [result[channel] for channel in channels], frequency, bins
+    )
+    if folded is None:
+        return None
+
+    output = {"phase": folded["phase"].tolist(), "cycles": folded["cycles"]}
+    for i, channel in enumerate(channels):
+        output[channel] = finite_list(folded["mean"][i])
+        output[f"{channel}_error"] = finite_list(folded["error"][i])
+    return output
+
+
+# For a PUND drive (see waveforms.pund) the second pulse of each sign only carries
+# the non-switching current, so subtracting it from the first leaves the switching
+# current. Returns both differences over one pulse slot.
+def pund_switching(times, current, frequency: float, bins: int = 256) -> dict | None:
+    bins -= bins % 4
+    folded = fold_cycles(times, current, frequency, bins)
+    if folded is None:
+        return None
+    p, u, n, d = folded["mean"][0].reshape(4, bins // 4)
+    return {
+        "phase": folded["phase"][: bins // 4],
+        "positive": p - u,
+        "negative": n - d,
+        "cycles": folded["cycles"],
+    }
+
+
+def pund_result(
+    result: dict, frequency: float, bins: int = 256, current_gain: float = 1.0
+) -> dict | None:
+    switching = pund_switching(
+        result["time"], result["channel2"], frequency, bins
+    )
+    if switching is None:
+        return None
+    return {
+        "phase": switching["phase"].tolist(),
+        "positive": finite_list(switching["positive"] * current_gain),
+        "negative": finite_list(switching["negative"] * current_gain),
+        "cycles": switching["cycles"],
+    }
+
+
+# Digital lock-in: complex amplitude of the drive frequency and its harmonics in
+# each channel, over the whole number of periods after the trigger. For a channel
+# x = A cos(n w t + phi) the n-th amplitude is A exp(i phi).
+def demodulate(times, data, frequency: float, harmonics: int = 5) -> dict | None:
+    times = np.asarray(times, dtype=float)
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    period = 1.0 / frequency
+
+    start = times[0] + (-times[0]) % period
+    cycles = int(np.floor((times[-1] - start) / period))
+    if cycles < 1:
+        return None
+
+    inside = (times >= start) & (times < start + cycles * period)
+    samples = data[:, inside]
+    samples = samples - samples.mean(axis=1, keepdims=True)
+    orders = np.arange(1, harmonics + 1)
+    reference = np.exp(-2j * np.pi * frequency * np.outer(orders, times[inside]))
+    amplitudes = 2 * samples @ reference.T / inside.sum()
+    return {"orders": orders, "amplitudes": amplitudes, "cycles": cycles}
+
+
+# In-phase and quadrature parts of each channel, referred to the phase of the
+# applied voltage (channel 1) so they do not depend on where the scope triggered,
+# plus the small-signal capacitance and loss tangent of the sample.
+def harmonics_result(
+    result: dict, frequency: float, harmonics: int = 5, current_gain: float = 1.0
+) -> dict | None:
+    channels = ["channel1", "channel2", "channel3"]
+    demodulated = demodulate(
+        result["time"], [result[channel] for channel in channels], frequency, harmonics
+    )
+    if demodulated is None:
+        return None
+
+    amplitudes = demodulated["amplitudes"]
+    drive = amplitudes[0, 0]
+    amplitudes = amplitudes * np.exp(-1j * demodulated["orders"] * np.angle(drive))
+
+    output = {"orders": demodulated["orders"].tolist(), "cycles": demodulated["cycles"]}
+    for i, channel in enumerate(channels):
+        output[channel] = {
+            "in_phase": finite_list(amplitudes[i].real),
+            "quadrature": finite_list(amplitudes[i].imag),
+        }
+
+    # channel 2 is the current monitor: Y = I / V = G + i w C.
+    if abs(drive) > 0:
+        admittance = current_gain * amplitudes[1, 0] / abs(drive)
+        omega = 2 * np.pi * frequency
+        output["capacitance"] = float(admittance.imag / omega)
+        output["conductance"] = float(admittance.real)
+        # no reactive current, so there is no loss angle to give.
+        output["loss_tangent"] = (
+            float(admittance.real / admittance.imag) if admittance.imag != 0 else None
+        )
+    return output
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from smponpol.instruments import Agilent33220A, Instec, Rigol4204
+from smponpol.session import ManagedResource
+
+
+# Every driver gets a single worker thread, so commands to one instrument are
+# executed in the order they were awaited and never contend for its link,
+# while different instruments still talk to their links concurrently.
+class AsyncDriver:
+    driver_class = None
+
+    def __init__(self, driver, executor: ThreadPoolExecutor | None = None) -> None:
+        self.driver = driver
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=type(driver).__name__
+        )
+        self.active = None  # worker thread running the current command
+
+    @classmethod
+    async def connect(cls, address: str):
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=cls.driver_class.__name__
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            driver = await loop.run_in_executor(executor, cls.driver_class, address)
+        except Exception:
+            executor.shutdown(wait=False)
+            raise
+        return cls(driver, executor)
+
+    async def run(self, function, *args, **kwargs):
+        def tracked():
+            thread = threading.current_thread()
+            self.active = thread
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if self.active is thread:
+                    self.active = None
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, tracked)
+
+    # Cancelling the awaiting task leaves a stuck command running in its worker.
+    # This closes the instrument's link under it, refuses it any further I/O and
+    # moves later commands to a fresh worker instead of queueing them behind it.
+    def abort(self) -> None:
+        thread = self.active
+        if thread is None:
+            return
+        for handle in vars(self.driver).values():
+            if isinstance(handle, ManagedResource):
+                handle.abort(thread)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=type(self.driver).__name__
+        )
+        self.active = None
+
+    def __getattr__(self, name):
+        attribute = getattr(self.driver, name)
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, **kwargs):
+            return await self.run(attribute, *args, **kwargs)
+
+        return method
+
+    async def close(self) -> None:
+        await self.run(self.driver.close)
+        self.executor.shutdown(wait=False)
+
+
+class AsyncInstec(AsyncDriver):
+    driver_class = Instec
+
+
+class AsyncAgilent33220A(AsyncDriver):
+    driver_class = Agilent33220A
+
+
+class AsyncRigol4204(AsyncDriver):
+    driver_class = Rigol4204
+
+
+class InstrumentLoop:
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine) -> Future:
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        future.add_done_callback(_report_exception)
+        return future
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+def _report_exception(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print("Instrument task failed: ", future.exception())
+
+
+_instrument_loop = None
+_instrument_loop_lock = threading.Lock()
+
+
+def get_instrument_loop() -> InstrumentLoop:
+    global _instrument_loop
+    with _instrument_loop_lock:
+        if _instrument_loop is None:
+            _instrument_loop = InstrumentLoop()
+        return _instrument_loop
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+# Welford's running mean and variance, one value per sample of the trace, so
+# repeated captures can be accumulated without keeping them in memory.
+class StreamingAverage:
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def add(self, trace) -> None:
+        trace = np.asarray(trace, dtype=float)
+        if self.mean is None:
+            self.mean = np.zeros_like(trace)
+            self.m2 = np.zeros_like(trace)
+        self.count += 1
+        delta = trace - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (trace - self.mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.full_like(self.mean, np.inf)
+        return self.m2 / (self.count - 1)
+
+    # uncertainty of the mean at each sample
+    @property
+    def standard_error(self) -> np.ndarray:
+        return np.sqrt(self.variance / self.count)
+
+    # single figure for the whole trace: RMS of the per-sample standard error
+    def noise(self) -> float:
+        return float(np.sqrt(np.mean(self.standard_error**2)))
+
+
+# DS4000 averaging counts are powers of two from 2 to 8192.
+SCOPE_AVERAGES = tuple(2**n for n in range(1, 14))
+
+
+# RMS noise per sample from one trace. Second differences cancel anything that
+# changes slowly over a few samples, and the median ignores the fast switching
+# edges. For white noise x[i-1] - 2x[i] + x[i+1] has variance 6 sigma^2.
+def sample_noise(trace) -> float:
+    second = np.diff(np.asarray(trace, dtype=float), n=2)
+    mad = np.median(np.abs(second - np.median(second)))
+    return float(1.4826 * mad / np.sqrt(6))
+
+
+def repeats_needed(error: float, target: float, cap: int) -> int:
+    # the uncertainty of a mean falls as 1/sqrt(repeats).
+    if target <= 0 or not np.isfinite(error):
+        return cap
+    return int(min(max(np.ceil((error / target) ** 2), 1), cap))
+
+
+def scope_average_count(repeats: int, cap: int) -> int:
+    for count in SCOPE_AVERAGES:
+        if count >= repeats:
+            return min(count, max(cap, SCOPE_AVERAGES[0]))
+    return cap
@@ -0,0 +1,222 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+from smponpol.browser import load_data_file
+from smponpol.hysteresis import SUMMARY, analyse_run
+
+CHANNELS = ["time", "channel1", "channel2", "channel3"]
+MANIFEST = "manifest.jsonl"
+
+
+def find_inputs(root: Path, output: Path, kinds: list[str]) -> list[Path]:
+    inputs = []
+    for directory, _, files in os.walk(root):
+        if Path(directory).resolve().is_relative_to(output.resolve()):
+            continue
+        for name in files:
+            if Path(name).suffix.lstrip(".") in kinds:
+                inputs.append(Path(directory) / name)
+    return sorted(inputs)
+
+
+def iter_points(results: dict, labels: tuple = ()):
+    # results.json nests one level per swept axis down to the trace itself.
+    if "time" in results:
+        yield labels, results
+        return
+    for label, value in results.items():
+        if isinstance(value, dict):
+            yield from iter_points(value, labels + (label,))
+
+
+def read_input(path: Path) -> list[tuple[str, dict]]:
+    if path.suffix == ".dat":
+        return [(path.stem, load_data_file(path))]
+    with open(path, "r") as f:
+        results = json.load(f)
+    return [
+        (" / ".join(labels), {name: np.asarray(trace[name]) for name in CHANNELS})
+        for labels, trace in iter_points(results)
+    ]
+
+
+def excel_layout(results: dict) -> dict | None:
+    # legacy results nest temperature then voltage above plain columns, which is
+    # the only layout written here.
+    layout = dict()
+    for outer, inner in results.items():
+        layout[outer] = dict()
+        for label, trace in inner.items():
+            if "time" not in trace:
+                return None
+            layout[outer][label] = {name: trace[name] for name in CHANNELS}
+    return layout
+
+
+def process_file(
+    path: Path, output: Path, current_gain: float, area: float, excel: bool
+) -> dict:
+    points = read_input(path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    arrays = {"labels": np.array([label for label, _ in points])}
+    for i, (_, trace) in enumerate(points):
+        for name in CHANNELS:
+            arrays[f"{i}/{name}"] = trace[name]
+    np.savez_compressed(output, **arrays)
+
+    summary = analyse_run([trace for _, trace in points], current_gain, area)
+    rows = [
+        {"label": label} | {name: float(summary[name][i]) for name in SUMMARY}
+        for i, (label, _) in enumerate(points)
+    ]
+
+    if excel and path.suffix == ".json":
+        # not smponpol.dataclasses, which would load the GUI in every worker.
+        from smponpol.excel_writer import OutputType, make_excel
+
+        with open(path, "r") as f:
+            layout = excel_layout(json.load(f))
+        if layout is not None:
+            make_excel(layout, str(output), OutputType.MULTI_VOLT)
+
+    return {"points": len(points), "rows": rows}
+
+
+def load_manifest(path: Path) -> dict:
+    done = dict()
+    if path.exists():
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # cut short by an interrupted run
+                done[entry["path"]] = entry
+    return done
+
+
+def write_summary(path: Path, entries: list[dict]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "label"] + SUMMARY)
+        for entry in entries:
+            for row in entry["rows"]:
+                writer.writerow(
+                    [entry["path"], row["label"]] + [row[name] for name in SUMMARY]
+                )
+
+
+# Converts a tree of legacy .dat and results.json files to compressed .npz, with
+# a loop summary for every trace. Files are spread over worker processes. Each
+# finished file is appended to a manifest, so an interrupted batch picks up where
+# it stopped and unchanged files are never converted twice.
+def run_batch(
+    root: Path,
+    output: Path,
+    kinds: list[str],
+    processes: int | None = None,
+    current_gain: float = 1.0,
+    area: float = 1.0,
+    excel: bool = False,
+) -> None:
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST
+    done = load_manifest(manifest_path)
+
+    pending = []
+    for path in find_inputs(root, output, kinds):
+        key = str(path.relative_to(root))
+        stat = path.stat()
+        entry = done.get(key)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+        pending.append((path, key, stat))
+    print(f"{len(pending)} files to process, {len(done)} already done")
+
+    start = time.perf_counter()
+    processed_bytes = 0
+    points = 0
+    failed = 0
+    with (
+        ProcessPoolExecutor(processes) as pool,
+        open(manifest_path, "a") as manifest,
+    ):
+        futures = {
+            pool.submit(
+                process_file,
+                path,
+                output / (key + ".npz"),
+                current_gain,
+                area,
+                excel,
+            ): (key, stat)
+            for path, key, stat in pending
+        }
+        for count, future in enumerate(as_completed(futures), start=1):
+            key, stat = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Could not process {key}: ", e)
+                continue
+
+            entry = {"path": key, "mtime": stat.st_mtime, "size": stat.st_size}
+            entry |= result
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+            done[key] = entry
+
+            processed_bytes += stat.st_size
+            points += result["points"]
+            if count % 50 == 0 or count == len(futures):
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{count}/{len(futures)} files, {count / elapsed:.1f} files/s,"
+                    f" {processed_bytes / elapsed / 1e6:.1f} MB/s,"
+                    f" {points / elapsed:.0f} points/s"
+                )
+
+    write_summary(output / "summary.csv", list(done.values()))
+    if failed:
+        print(f"{failed} files failed and will be retried on the next run")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert and re-analyse old .dat and results .json files."
+    )
+    parser.add_argument("root", type=Path, help="directory to search")
+    parser.add_argument(
+        "--output", type=Path, help="where to write, default <root>/processed"
+    )
+    parser.add_argument(
+        "--kinds", default="dat,json", help="file types to include, e.g. json"
+    )
+    parser.add_argument("--processes", type=int, help="default one per CPU")
+    parser.add_argument("--gain", type=float, default=1.0, help="current monitor A/V")
+    parser.add_argument("--area", type=float, default=1.0, help="electrode area, cm^2")
+    parser.add_argument(
+        "--excel", action="store_true", help="also write .xlsx for results files"
+    )
+    args = parser.parse_args()
+
+    run_batch(
+        args.root,
+        args.output or args.root / "processed",
+        args.kinds.split(","),
+        args.processes,
+        args.gain,
+        args.area,
+        args.excel,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_SIZE = 32
+# points either side of the selected one that are read ahead of time.
+PREFETCH_DISTANCE = 3
+
+
+def load_data_file(path: str) -> dict:
+    import numpy as np
+
+    # same layout as export_data_file writes: headings, "Data", then tab separated rows.
+    table = np.loadtxt(path, delimiter="\t", skiprows=2, ndmin=2)
+    return {
+        "time": table[:, 0],
+        "channel1": table[:, 1],
+        "channel2": table[:, 2],
+        "channel3": table[:, 3],
+    }
+
+
+# Reads .dat files on demand and keeps the most recently used ones. Files near the
+# current selection are read on a background thread, so stepping through a run
+# usually finds the next trace already in memory.
+class TraceReader:
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pending = dict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
+    def load(self, path: str) -> dict:
+        with self.lock:
+            if path in self.cache:
+                self.cache.move_to_end(path)
+                return self.cache[path]
+            future = self.pending.get(path)
+        if future is not None:
+            return future.result()
+        return self._read(path)
+
+    def prefetch(self, paths: list[str]) -> None:
+        with self.lock:
+            for path in paths:
+                if path in self.cache or path in self.pending:
+                    continue
+                future = self.executor.submit(self._read, path)
+                self.pending[path] = future
+                future.add_done_callback(lambda _, path=path: self._finished(path))
+
+    def _finished(self, path: str) -> None:
+        with self.lock:
+            self.pending.pop(path, None)
+
+    def _read(self, path: str) -> dict:
+        trace = load_data_file(path)
+        with self.lock:
+            self.cache[path] = trace
+            self.cache.move_to_end(path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return trace
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+
+
+def neighbours(index: int, count: int, distance: int = PREFETCH_DISTANCE) -> list[int]:
+    # nearest first, so the likely next selection is read before the rest.
+    order = []
+    for offset in range(1, distance + 1):
+        for candidate in (index + offset, index - offset):
+            if 0 <= candidate < count:
+                order.append(candidate)
+    return order
@@ -1,14 +1,16 @@
 from dataclasses import dataclass, field
-from smponpol.instruments import Instec, Agilent33220A
+from smponpol.async_instruments import AsyncInstec, AsyncAgilent33220A, AsyncRigol4204
+from smponpol.sweep import SweepPlan, SweepPoint, ResultStore
+from smponpol.journal import SweepJournal
+from smponpol.run_index import RunIndex
+from smponpol.hotstage_scheduler import HotstageScheduler
+from smponpol.telemetry import TelemetryBuffer
+from smponpol.monitor import MonitorServer
+from smponpol.trace_history import TraceHistory
+from smponpol.browser import TraceReader
+from smponpol.timebase import TimebasePlan
+from smponpol.excel_writer import OutputType
 from enum import Enum
-from pyvisa.resources import Resource
-
-
-class OutputType(Enum):
-    SINGLE_VOLT = 1
-    SINGLE_FREQ = 2
-    SINGLE_VOLT_FREQ = 3
-    MULTI_VOLT_FREQ = 4
 
 
 class Status(Enum):
@@ -19,6 +21,7 @@ class Status(Enum):
     TEMPERATURE_STABILISED = 5
     COLLECTING_DATA = 6
     FINISHED = 7
+    RAMP_ACQUIRING = 8
 
 
 @dataclass
@@ -44,9 +47,28 @@ class variable_list:
     range_selector: range_selector_window
 
 
+@dataclass
+class acquisition_settings:
+    host_averaging: bool = False
+    max_shots: int = 16
+    target_noise: float = 0.0  # V, 0 always takes max_shots
+    scope_averages: int = 64
+    fold_cycles: bool = False
+    phase_bins: int = 256
+    current_gain: float = 1.0  # A/V at the current monitor
+    electrode_area: float = 1.0  # cm^2
+    harmonics: int = 5  # lock-in orders per point, 0 turns it off
+    auto_range: bool = False
+    cycles: int = 4  # periods on screen, 0 leaves the timebase as set on the scope
+    samples_per_cycle: int = 1000
+    # uC/cm^2; averaging per point is sized from a pilot capture to reach it, with
+    # max_shots or scope_averages as the cap. 0 keeps the fixed averaging.
+    target_ps_error: float = 0.0
+
+
 @dataclass
 class lcd_state:
-    resultsDict: dict = field(default_factory=dict)
+    results: ResultStore | None = None
     measurement_status: Status = Status.IDLE
     t_stable_start: float = 0
     voltage_list_mode: bool = False
@@ -58,18 +80,40 @@ class lcd_state:
     hotstage_action: str = "Idle"
     hotstage_temperature: float = 25.0
     T_list: list = field(default_factory=list)
-    # freq_list: list = field(default_factory=list)
+    freq_list: list = field(default_factory=list)
     voltage_list: list = field(default_factory=list)
     xdata: list = field(default_factory=list)
     ydata: list = field(default_factory=list)
-    T_step: int = 0
-    voltage_step: int = 0
-    T_log_time: list = field(default_factory=list)
-    T_log_T: list = field(default_factory=list)
+    sweep: SweepPlan | None = None
+    sweep_step: int = 0
+    applied_step: int | None = None
+    journal: SweepJournal | None = None
+    run_index: RunIndex | None = None
+    run_id: str | None = None
+    acquisition: acquisition_settings = field(default_factory=acquisition_settings)
+    series_progress: tuple = (0, 0)
+    failed_points: dict = field(default_factory=dict)
+    rig: str | None = None
+    monitor: MonitorServer | None = None
+    vertical_ranges: dict = field(default_factory=dict)  # channel: (V/div, offset)
+    timebase: TimebasePlan | None = None
+    trace_history: TraceHistory = field(default_factory=TraceHistory)
+    trace_reader: TraceReader = field(default_factory=TraceReader)
+    browser_points: list = field(default_factory=list)
+    browser_labels: list = field(default_factory=list)
+    continuous_ramp: bool = False
+    ramp_end: float = 0.0
+    ramp_pass: int = 0
+    telemetry: TelemetryBuffer = field(default_factory=TelemetryBuffer)
+
+    @property
+    def current_point(self) -> SweepPoint:
+        return self.sweep[self.sweep_step]
 
 
 @dataclass
 class lcd_instruments:
-    hotstage: Instec | None = None
-    agilent: Agilent33220A | None = None
-    oscilloscope: Resource | None = None
+    hotstage: AsyncInstec | None = None
+    agilent: AsyncAgilent33220A | None = None
+    oscilloscope: AsyncRigol4204 | None = None
+    hotstage_scheduler: HotstageScheduler | None = None
@@ -1,7 +1,27 @@
-import xlsxwriter
-from smponpol.dataclasses import OutputType
+from enum import Enum
+
+
+class OutputType(Enum):
+    SINGLE_VOLT = 1
+    SINGLE_FREQ = 2
+    SINGLE_VOLT_FREQ = 3
+    MULTI_VOLT_FREQ = 4
+    # temperature then voltage, as sweeps without a frequency list are nested.
+    MULTI_VOLT = 5
+
+
+def label_value(label: str):
+    # labels look like "2: 1.5"; the value after the colon, as a number if it is one.
+    value = label.split(":")[-1].strip()
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
 
 def make_excel(results: dict, output: str, output_type: OutputType) -> None:
+    import xlsxwriter
+
     workbook = xlsxwriter.Workbook(output.split(".json")[0] + ".xlsx")
 
     if output_type == OutputType.SINGLE_VOLT_FREQ:
@@ -69,5 +89,19 @@ def make_excel(results: dict, output: str, output_type: OutputType) -> None:
                         start_row * i + 2, j, results[T][freq][heading]
                     )
             worksheet.autofit() 
+        elif output_type == OutputType.MULTI_VOLT:
+            worksheet = workbook.add_worksheet(name=str(f"{T.split(':')[0]} - {T.split(':')[-1]}"))
+            for i, volt in enumerate(results[T].keys()):
+                col_headings = list(results[T][volt].keys())
+                start_row = len(results[T][volt][col_headings[0]]) + 3
+                worksheet.write(start_row * i, 0, "Voltage (V): ")
+                worksheet.write(start_row * i, 1, label_value(volt))
+                worksheet.write_row((start_row) * i + 1, 0, col_headings)
+
+                for j, heading in enumerate(col_headings):
+                    worksheet.write_column(
+                        start_row * i + 2, j, results[T][volt][heading]
+                    )
+            worksheet.autofit() 
     
     workbook.close()
@@ -0,0 +1,122 @@
+import asyncio
+import itertools
+import time
+
+# poll periods in seconds: fast while the stage is ramping or settling, slow when idle.
+FAST_PERIOD = 0.2
+IDLE_PERIOD = 1.0
+MAX_BACKOFF = 5.0
+STOPPED = "the hotstage scheduler has stopped"
+# a change larger than this between two samples counts as the stage moving.
+MOVING_THRESHOLD = 0.05
+# a stage at rest this close to its target has reached it.
+TARGET_TOLERANCE = 0.1
+
+STOP_PRIORITY = 0
+COMMAND_PRIORITY = 1
+
+
+# Sole owner of the hotstage link. Control commands are queued and always run
+# before the next temperature poll; everyone else reads the cached sample.
+class HotstageScheduler:
+    def __init__(self, hotstage, on_sample=None) -> None:
+        self.hotstage = hotstage
+        self.on_sample = on_sample
+        self.commands = asyncio.PriorityQueue()
+        self.sequence = itertools.count()
+        self.latest = None  # (monotonic time, temperature)
+        self.target = None
+        self.moving = False
+        self.failures = 0
+        self.running = False
+        self.task = None
+
+    def start(self) -> None:
+        self.running = True
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def poll_period(self) -> float:
+        period = FAST_PERIOD if self.target is not None or self.moving else IDLE_PERIOD
+        if self.failures > 0:
+            period = min(period * 2**self.failures, MAX_BACKOFF)
+        return period
+
+    async def command(self, name: str, *args, priority: int = COMMAND_PRIORITY):
+        future = asyncio.get_running_loop().create_future()
+        await self.commands.put((priority, next(self.sequence), name, args, future))
+        return await future
+
+    async def ramp(self, T: float, rate: float) -> None:
+        self.target = T
+        await self.command("ramp", T, rate)
+
+    async def hold(self, T: float) -> None:
+        self.target = T
+        await self.command("hold", T)
+
+    async def stop(self) -> None:
+        self.target = None
+        # without a running loop the command would never be answered, and nothing
+        # queued has reached the stage yet.
+        if self.task is None or self.task.done():
+            self.fail_pending("the hotstage scheduler is not running")
+            return
+        await self.command("stop", priority=STOP_PRIORITY)
+
+    async def run(self) -> None:
+        next_poll = time.monotonic()
+        try:
+            while self.running:
+                try:
+                    _, _, name, args, future = await asyncio.wait_for(
+                        self.commands.get(), max(next_poll - time.monotonic(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    await self.poll()
+                    next_poll = time.monotonic() + self.poll_period()
+                    continue
+
+                try:
+                    future.set_result(await getattr(self.hotstage, name)(*args))
+                except asyncio.CancelledError:
+                    future.set_exception(RuntimeError(STOPPED))
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            self.fail_pending(STOPPED)
+
+    def fail_pending(self, reason: str) -> None:
+        while not self.commands.empty():
+            *_, future = self.commands.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    async def poll(self) -> None:
+        # a bad reply or a dropped link only slows polling down; it must not end it.
+        try:
+            temperature = await self.hotstage.get_temperature()
+        except Exception as e:
+            print("Could not read the hotstage temperature: ", e)
+            temperature = None
+        if temperature is None:
+            self.failures += 1
+            return
+
+        self.failures = 0
+        if self.latest is not None:
+            self.moving = abs(temperature - self.latest[1]) > MOVING_THRESHOLD
+        self.latest = (time.monotonic(), temperature)
+        if (
+            self.target is not None
+            and not self.moving
+            and abs(temperature - self.target) <= TARGET_TOLERANCE
+        ):
+            self.target = None
+        if self.on_sample is not None:
+            self.on_sample(*self.latest)
+
+    def close(self) -> None:
+        self.running = False
+        if self.task is not None:
+            self.task.cancel()
@@ -0,0 +1,226 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from smponpol.averaging import sample_noise
+
+# channel1 is the applied voltage, channel2 the current monitor.
+VOLTAGE_CHANNEL = "channel1"
+CURRENT_CHANNEL = "channel2"
+SUMMARY = ["ps", "pr", "vc", "loop_area", "cycles"]
+# generator shapes whose current integrates to a P-E loop; pulse trains do not.
+LOOP_WAVEFORMS = ("SIN", "TRI")
+# standard deviation of the range of a unit Brownian bridge.
+BRIDGE_RANGE_STD = np.sqrt(np.pi**2 / 6 - np.pi / 2)
+
+
+def crossing_values(signal: np.ndarray, other: np.ndarray, rising: bool):
+    # `other` interpolated where `signal` crosses zero, NaN where it does not.
+    before, after = signal[:, :-1], signal[:, 1:]
+    if rising:
+        crossed = (before < 0) & (after >= 0)
+    else:
+        crossed = (before > 0) & (after <= 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = before / (before - after)
+        values = other[:, :-1] + fraction * (other[:, 1:] - other[:, :-1])
+    return np.where(crossed, values, np.nan), crossed.sum(axis=1)
+
+
+# P-E loops for many points at once. `times` is (samples,) or (points, samples),
+# `voltage` and `current` are (points, samples) in V and in V at the current
+# monitor. Polarisation comes out in uC/cm^2 given the monitor gain in A/V and the
+# electrode area in cm^2; with the defaults it is the integrated monitor signal.
+def hysteresis_loops(
+    times, voltage, current, current_gain: float = 1.0, area: float = 1.0
+) -> dict:
+    if area <= 0:
+        raise ValueError(f"The electrode area must be positive, not {area}")
+    voltage = np.atleast_2d(np.asarray(voltage, dtype=float))
+    current = np.atleast_2d(np.asarray(current, dtype=float)) * current_gain
+    times = np.broadcast_to(np.asarray(times, dtype=float), voltage.shape)
+
+    # a DC leak would make the integrated charge run away, so remove it first.
+    current = current - current.mean(axis=1, keepdims=True)
+    dt = np.diff(times, axis=1)
+    charge = np.concatenate(
+        [
+            np.zeros((len(current), 1)),
+            np.cumsum(0.5 * (current[:, 1:] + current[:, :-1]) * dt, axis=1),
+        ],
+        axis=1,
+    )
+    polarisation = charge / area * 1e6
+    highest = polarisation.max(axis=1, keepdims=True)
+    lowest = polarisation.min(axis=1, keepdims=True)
+    polarisation -= (highest + lowest) / 2
+
+    # coercive voltage from where P changes sign on the rising and falling branches.
+    up, _ = crossing_values(polarisation, voltage, rising=True)
+    down, _ = crossing_values(polarisation, voltage, rising=False)
+    # remanence from P where the applied voltage passes through zero.
+    from_negative, cycles = crossing_values(voltage, polarisation, rising=True)
+    from_positive, _ = crossing_values(voltage, polarisation, rising=False)
+
+    # points without crossings (e.g. 0 V) come out as NaN.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        vc = (np.nanmean(up, axis=1) - np.nanmean(down, axis=1)) / 2
+        pr = (
+            np.nanmean(from_positive, axis=1) - np.nanmean(from_negative, axis=1)
+        ) / 2
+
+    mean_p = 0.5 * (polarisation[:, 1:] + polarisation[:, :-1])
+    loop_area = np.abs(np.sum(mean_p * np.diff(voltage), axis=1))
+    loop_area /= np.maximum(cycles, 1)
+
+    return {
+        "polarisation": polarisation,
+        "ps": (highest - lowest)[:, 0] / 2,
+        "pr": pr,
+        "vc": np.abs(vc),
+        "loop_area": loop_area,
+        "cycles": cycles,
+    }
+
+
+def loop_summary(result: dict, current_gain: float = 1.0, area: float = 1.0) -> dict:
+    loops = hysteresis_loops(
+        result["time"],
+        result[VOLTAGE_CHANNEL],
+        result[CURRENT_CHANNEL],
+        current_gain,
+        area,
+    )
+    # JSON has no NaN, so values a degenerate loop does not have are left empty.
+    summary = dict()
+    for name in SUMMARY:
+        value = loops[name][0].item()
+        summary[name] = value if np.isfinite(value) else None
+    return summary
+
+
+# Ps from one un-averaged capture and its uncertainty. With the mean current
+# removed, noise integrates into P as a Brownian bridge over the record, and Ps is
+# half the range of P, so its spread is half that of the bridge's range.
+def ps_uncertainty(
+    times, voltage, current, current_gain: float = 1.0, area: float = 1.0
+) -> tuple[float, float]:
+    loops = hysteresis_loops(times, voltage, current, current_gain, area)
+    dt = float(np.mean(np.diff(times)))
+    noise = sample_noise(current) * abs(current_gain)
+    walk = noise * dt * np.sqrt(len(current)) / area * 1e6
+    return loops["ps"][0].item(), float(BRIDGE_RANGE_STD / 2 * walk)
+
+
+def _summarise(arguments) -> dict:
+    times, voltage, current, current_gain, area = arguments
+    loops = hysteresis_loops(times, voltage, current, current_gain, area)
+    return {name: loops[name] for name in SUMMARY}
+
+
+# Summary values for a whole run. Traces of the same length are stacked and done
+# in one go; with `processes` the stacks are split across worker processes.
+def analyse_run(
+    traces: list[dict],
+    current_gain: float = 1.0,
+    area: float = 1.0,
+    processes: int | None = None,
+    chunk: int = 256,
+) -> dict:
+    groups = dict()
+    for i, trace in enumerate(traces):
+        groups.setdefault(len(trace["time"]), []).append(i)
+
+    jobs = []
+    for members in groups.values():
+        for start in range(0, len(members), chunk):
+            part = members[start : start + chunk]
+            jobs.append(
+                (
+                    part,
+                    (
+                        np.asarray(traces[part[0]]["time"], dtype=float),
+                        np.stack([traces[i][VOLTAGE_CHANNEL] for i in part]),
+                        np.stack([traces[i][CURRENT_CHANNEL] for i in part]),
+                        current_gain,
+                        area,
+                    ),
+                )
+            )
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(processes) as pool:
+            outputs = list(pool.map(_summarise, [job for _, job in jobs]))
+    else:
+        outputs = [_summarise(job) for _, job in jobs]
+
+    summary = {name: np.full(len(traces), np.nan) for name in SUMMARY}
+    for (part, _), output in zip(jobs, outputs):
+        for name in SUMMARY:
+            summary[name][part] = output[name]
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="P-E loop summary (Ps, Pr, Vc, loop area) for each point of a run."
+    )
+    parser.add_argument("--run", help="run id from the run index, default the latest")
+    parser.add_argument("--index", help="run index file")
+    parser.add_argument("--gain", type=float, default=1.0, help="current monitor A/V")
+    parser.add_argument("--area", type=float, default=1.0, help="electrode area, cm^2")
+    parser.add_argument(
+        "--processes", type=int, help=f"worker processes, up to {os.cpu_count()}"
+    )
+    parser.add_argument("--output", help="CSV file, default stdout")
+    args = parser.parse_args()
+
+    from smponpol.run_index import DEFAULT_INDEX_PATH, RunIndex
+    from smponpol.browser import load_data_file
+
+    index = RunIndex(args.index or DEFAULT_INDEX_PATH)
+    run_id = args.run
+    if run_id is None:
+        runs = index.runs(limit=1)
+        if not runs:
+            print("The run index is empty")
+            sys.exit(1)
+        run_id = runs[0]["run_id"]
+    points = index.points(run_id)
+
+    start = time.perf_counter()
+    traces = [load_data_file(point["file_path"]) for point in points]
+    loaded = time.perf_counter()
+    summary = analyse_run(traces, args.gain, args.area, args.processes)
+    done = time.perf_counter()
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(["labels", "temperature", "voltage", "frequency"] + SUMMARY)
+    for i, point in enumerate(points):
+        writer.writerow(
+            [
+                " / ".join(json.loads(point["labels"])),
+                point["temperature"],
+                point["voltage"],
+                point["frequency"],
+            ]
+            + [summary[name][i] for name in SUMMARY]
+        )
+    if args.output:
+        output.close()
+    print(
+        f"{run_id}: {len(points)} points, read in {loaded - start:.2f}s,"
+        f" analysed in {done - loaded:.2f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
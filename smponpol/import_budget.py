@@ -0,0 +1,70 @@
+import argparse
+import subprocess
+import sys
+
+# cold-start target for `python -m smponpol` on the lab PCs, in seconds.
+DEFAULT_BUDGET = 1.0
+
+# loaded on first use; any of these showing up at startup fails the check.
+LAZY_MODULES = [
+    "numpy",
+    "pyvisa",
+    "xlsxwriter",
+    "tkinter",
+    "smponpol.analysis",
+    "smponpol.hysteresis",
+]
+
+
+def measure_imports(module: str = "smponpol.main") -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    # lines look like "import time:       123 |        456 |   package.module"
+    timings = dict()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            timings[name.strip()] = int(cumulative) / 1e6
+        except ValueError:
+            continue  # the column heading line
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that importing the application stays within budget."
+    )
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    parser.add_argument("--module", default="smponpol.main")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        timings = measure_imports(args.module)
+    except RuntimeError as e:
+        print(f"Could not import {args.module}: {e}")
+        sys.exit(2)
+
+    total = timings[args.module]
+    print(f"{args.module}: {total:.3f}s (budget {args.budget:.3f}s)")
+    print("Slowest imports (cumulative):")
+    for name, seconds in sorted(timings.items(), key=lambda x: -x[1])[: args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in timings]
+    if eager:
+        print(f"Imported at startup but should load on first use: {', '.join(eager)}")
+    if total > args.budget or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
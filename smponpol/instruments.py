@@ -1,7 +1,11 @@
-import pyvisa
 import threading
 import time
 import struct
+from smponpol.session import get_session
+from smponpol.waveforms import is_generated_name, waveform_name
+
+# most points one :WAV:DATA? returns in BYTE format; longer records are read in parts.
+WAVEFORM_CHUNK = 250000
 
 
 def write_handler(instrument, command_string):
@@ -20,18 +24,17 @@ class LinkamHotstage:
         self.initialise_linkam()
 
     def initialise_linkam(self) -> None:
-        rm = pyvisa.ResourceManager()
-
-        self.link = rm.open_resource(self.address)
+        import pyvisa
+
+        self.link = get_session().open(
+            self.address,
+            baud_rate=19200,
+            read_termination="\r",
+            write_termination="\r",
+            timeout=3000,
+        )
         self.init = False
 
-        self.link.baud_rate = 19200  # type: ignore
-
-        self.link.read_termination = "\r"  # type: ignore
-        self.link.write_termination = "\r"  # type: ignore
-
-        self.link.timeout = 3000
-
         try:
             self.current_temperature()
             print("Linkam Connected!")
@@ -97,8 +100,9 @@ class LinkamHotstage:
 
 class Agilent33220A:
     def __init__(self, address):
-        rm = pyvisa.ResourceManager()
-        self.wfg = rm.open_resource(address)
+        self.wfg = get_session().open(address, timeout=5000)
+        # names in non-volatile arb memory: catalogue order, then least recently used
+        self.stored_waveforms = None
         self.set_waveform()
         self.set_symmetry()
         self.set_voltage_unit()
@@ -108,6 +112,49 @@ class Agilent33220A:
 
     def set_waveform(self, waveform="TRI"):
         self.wfg.write(f":FUNC {waveform}")
+        if waveform != "USER":
+            # user waveforms switch the amplitude to peak-to-peak.
+            self.set_voltage_unit("VRMS")
+
+    def get_stored_waveforms(self):
+        if self.stored_waveforms is None:
+            catalogue = self.wfg.query("DATA:NVOL:CAT?").strip()
+            self.stored_waveforms = [
+                name.strip('"') for name in catalogue.split(",") if name.strip('"')
+            ]
+        return self.stored_waveforms
+
+    # Uploads a shape as DAC codes (see waveforms.to_dac) and selects it. Shapes are
+    # stored under a name derived from their contents, so a shape that is already in
+    # the generator's memory is selected without sending it again.
+    def set_user_waveform(self, dac):
+        name = waveform_name(dac)
+        stored = self.get_stored_waveforms()
+        if name in stored:
+            stored.remove(name)
+        else:
+            self.wfg.write("FORM:BORD SWAP")
+            self.wfg.write_binary_values(
+                "DATA:DAC VOLATILE, ", dac, datatype="h", is_big_endian=False
+            )
+            # the selected waveform cannot be deleted, so move off it first.
+            self.wfg.write("FUNC:USER VOLATILE")
+            if int(self.wfg.query("DATA:NVOL:FREE?")) == 0:
+                # only shapes this code stored may be deleted to make room.
+                ours = [x for x in stored if is_generated_name(x)]
+                if not ours:
+                    raise RuntimeError(
+                        "The generator's arbitrary waveform memory is full of"
+                        " waveforms saved by hand; delete one to upload this shape"
+                    )
+                self.wfg.write(f"DATA:DEL {ours[0]}")
+                stored.remove(ours[0])
+            self.wfg.write(f"DATA:COPY {name}, VOLATILE")
+        stored.append(name)
+
+        self.wfg.write(f"FUNC:USER {name}")
+        self.wfg.write(":FUNC USER")
+        self.set_voltage_unit("VPP")
 
     def set_frequency(self, frequency=1000.0):
         self.wfg.write(f":FREQ {frequency}")
@@ -137,9 +184,11 @@ class Agilent33220A:
 
 class Rigol4204:
     def __init__(self, address):
-        rm = pyvisa.ResourceManager()
-        self.scope = rm.open_resource(address)
-        self.scope.timeout = 100000.0
+        # long enough for a 10k point ASCII transfer; a missing trigger is caught by
+        # the acquisition deadline rather than by waiting out the VISA timeout.
+        self.scope = get_session().open(address, timeout=15000)
+        # acquisition type in use before a waveform record, put back when it ends.
+        self.recording_acquisition_type = None
         self.scope.write(":TIM:HREF:MODE CENT")
         self.scope.write(":TRIG:NREJ ON")
         self.scope.write(f"CHAN{1}:DISP ON")
@@ -151,6 +200,15 @@ class Rigol4204:
     def run(self):
         self.scope.write(":RUN")
 
+    def recover(self):
+        # abandon any half-finished transfer and leave the scope running again.
+        try:
+            self.scope.clear()
+        except Exception:
+            self.scope.reconnect()
+        self.stop_frame_recording()
+        self.scope.write(":RUN")
+
     def init_scope_defaults(self):
         self.set_memory_depth()
         self.set_acquisition_type()
@@ -169,16 +227,23 @@ class Rigol4204:
         self.initialise_channel(2)
         self.initialise_channel(3)
 
-    # Memory Depth options: 1k, 10k, 100k, 1M, 10M, 25M, 50M, 100M, 125M
     def autoscale(self):
         self.scope.write("AUToset")
 
-    def set_memory_depth(self, depth=10000):
+    # Memory Depth options: AUTO, 14k, 140k, 1.4M, 14M, 140M with one channel of a
+    # pair on, half that with both. Only accepted while the scope is running.
+    def set_memory_depth(self, depth=7000):
         self.scope.write(f"ACQ:MDEP {depth}")
 
     def set_timebase(self, base=2e-6):
         self.scope.write(f":TIMebase:SCALe {base}")
 
+    def set_horizontal(self, scale, depth, holdoff):
+        # the sample rate follows from depth and scale, so set the scale first.
+        self.set_timebase(scale)
+        self.set_memory_depth(depth)
+        self.set_holdoff_time(holdoff)
+
     # acqusition types: NORM, AVER, PEAK, HRES
     def set_acquisition_type(self, acq_type="AVER"):
         self.scope.write(f":ACQ:TYPE {acq_type}")
@@ -242,17 +307,32 @@ class Rigol4204:
     def set_channel_vertical_range(self, channel=1, v_range=0.1):
         self.scope.write(f"CHAN{channel}:SCAL {v_range}")
 
-    def get_channel_trace(self, channel=1):
+    def get_channel_vertical(self, channel=1):
+        scale = float(self.scope.query(f":CHAN{channel}:SCAL?"))
+        offset = float(self.scope.query(f":CHAN{channel}:OFFS?"))
+        return scale, offset
+
+    def set_channel_vertical(self, channel, scale, offset):
+        # the allowed offset depends on the scale, so set the scale first.
+        self.set_channel_vertical_range(channel, scale)
+        self.set_channel_vertical_offset(channel, offset)
+
+    # averages on the scope for `wait` seconds, then stops so every channel can be
+    # read from the same averaged acquisition.
+    def acquire_averaged(self, averages=64, wait=5.0):
+        self.scope.write(f":ACQuire:TYPE AVERages;:ACQ:AVER {averages};")
         self.scope.write(":CLEAR")
         self.scope.write(":RUN")
-        time.sleep(5)
+        time.sleep(wait)
         self.scope.write(":STOP")
 
+    def get_channel_trace(self, channel=1, averages=64, wait=5.0):
+        self.acquire_averaged(averages, wait)
+        return self.read_channel_trace(channel)
+
+    def read_channel_trace(self, channel=1):
         self.scope.write(f":WAV:SOUR CHAN{channel}")
         self.scope.write(":WAV:FORM ASC;:WAV:MODE MAX")
-        self.scope.write(":ACQuire:TYPE AVERages;:ACQ:AVER 64;")
-        self.scope.write(":ACQ:MDEP 10k")
-        # self.scope.write(":WAVeform:POINts 10000")
 
         x_increment = float(self.scope.query("WAV:XINC?"))
         start_time = float(self.scope.query("WAV:XOR?"))
@@ -263,6 +343,92 @@ class Rigol4204:
 
         return times, data
 
+    def get_waveform_preamble(self):
+        preamble = self.scope.query(":WAV:PRE?").split(",")
+        return {
+            "points": int(preamble[2]),
+            "x_increment": float(preamble[4]),
+            "x_origin": float(preamble[5]),
+            "x_reference": float(preamble[6]),
+            "y_increment": float(preamble[7]),
+            "y_origin": float(preamble[8]),
+            "y_reference": float(preamble[9]),
+        }
+
+    # BYTE transfers are ~10x smaller than ASCII and need no string parsing.
+    def get_channel_block(self, channel=1):
+        import numpy as np
+
+        self.scope.write(f":WAV:SOUR CHAN{channel}")
+        self.scope.write(":WAV:FORM BYTE;:WAV:MODE RAW")
+        preamble = self.get_waveform_preamble()
+        # the read window does not cover the whole record by default, so it is set
+        # to all of the memory depth.
+        points = int(float(self.scope.query(":ACQ:MDEP?")))
+        chunks = []
+        for start in range(1, points + 1, WAVEFORM_CHUNK):
+            stop = min(start + WAVEFORM_CHUNK - 1, points)
+            self.scope.write(f":WAV:STAR {start};:WAV:STOP {stop}")
+            chunks.append(
+                self.scope.query_binary_values(
+                    ":WAV:DATA?", datatype="B", container=np.array
+                )
+            )
+        raw = np.concatenate(chunks)
+        if len(raw) != points:
+            raise RuntimeError(f"CHAN{channel} returned {len(raw)} of {points} points")
+        data = (raw - preamble["y_origin"] - preamble["y_reference"]) * preamble[
+            "y_increment"
+        ]
+        times = preamble["x_origin"] + preamble["x_increment"] * np.arange(len(data))
+        return times, data
+
+    # waveform record: every trigger while recording is stored as a frame in the
+    # scope's segmented memory.
+    def start_frame_recording(self, frames):
+        self.recording_acquisition_type = self.scope.query(":ACQ:TYPE?").strip()
+        self.scope.write(":ACQ:TYPE NORM")
+        self.scope.write(":FUNC:WREC:ENAB ON")
+        self.scope.write(f":FUNC:WREC:FEND {frames}")
+        self.scope.write(":FUNC:WREC:OPER RUN")
+
+    def single_frame(self, timeout=10.0):
+        self.scope.write(":SING")
+        time.sleep(0.05)
+        deadline = time.monotonic() + timeout
+        while self.scope.query(":TRIG:STAT?").strip() != "STOP":
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No trigger within {timeout}s")
+            time.sleep(0.01)
+
+    # one un-averaged triggered capture of each channel, for host-side averaging.
+    def get_single_capture(self, channels=(1, 2, 3), timeout=10.0):
+        self.scope.write(":ACQ:TYPE NORM")
+        self.single_frame(timeout)
+        traces = dict()
+        for channel in channels:
+            times, traces[channel] = self.get_channel_block(channel)
+        return times, traces
+
+    def get_recorded_frames(self, frames, channels=(1, 2, 3)):
+        import numpy as np
+
+        self.scope.write(":FUNC:WREC:OPER STOP")
+        traces = {channel: [] for channel in channels}
+        for frame in range(1, frames + 1):
+            self.scope.write(f":FUNC:WREP:FCUR {frame}")
+            for channel in channels:
+                times, data = self.get_channel_block(channel)
+                traces[channel].append(data)
+        self.stop_frame_recording()
+        return times, {channel: np.vstack(traces[channel]) for channel in channels}
+
+    def stop_frame_recording(self):
+        self.scope.write(":FUNC:WREC:ENAB OFF")
+        if self.recording_acquisition_type is not None:
+            self.set_acquisition_type(self.recording_acquisition_type)
+            self.recording_acquisition_type = None
+
     def close(self):
         self.scope.close()
 
@@ -272,22 +438,17 @@ class Rigol4204:
 # set memory depth, offset, scale and mode
 class Instec:
     def __init__(self, address):
-        rm = pyvisa.ResourceManager()
-        self.stage = rm.open_resource(address)
-        self.stage.write_termination = ""
-        self.stage.read_termination = ""
+        self.stage = get_session().open(
+            address, write_termination="", read_termination="", timeout=2000
+        )
         self.lock = threading.Lock()
 
         self.T = 25.0
 
     def write_message(self, message):
+        # retried as a whole: a reply read on a new connection would never come.
         with self.lock:
-            time.sleep(0.05)
-            self.stage.write_raw(message)
-            time.sleep(0.05)
-            self.stage.read_raw()
-            response = self.stage.read_raw()
-            time.sleep(0.05)
+            response = self.stage.transaction(self.exchange, message)
 
         # int_list = list(response)
 
@@ -308,6 +469,15 @@ class Instec:
 
         return response
 
+    def exchange(self, message):
+        time.sleep(0.05)
+        self.stage.write_raw(message)
+        time.sleep(0.05)
+        self.stage.read_raw()
+        response = self.stage.read_raw()
+        time.sleep(0.05)
+        return response
+
     def write_register(self, register, input):
         head = b"\x7f\x01\x07"
         checksum_1 = bytes([sum(head) & 0xFF])
@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from smponpol.sweep import SweepPlan, SweepPoint
+
+
+# Append-only record of a sweep: a header line with the plan, then one line per
+# completed point once its files are on disk. Every line is flushed and synced
+# before the sweep moves on, so after a crash the journal only ever lists points
+# that can be read back.
+class SweepJournal:
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @staticmethod
+    def path_for(output_file_path: str) -> str:
+        return output_file_path.split(".json")[0] + ".journal"
+
+    def _append(self, entry: dict, mode: str = "a") -> None:
+        with open(self.path, mode) as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, plan: SweepPlan, settings: dict) -> None:
+        self._append(
+            {
+                "type": "plan",
+                "plan": plan.to_dict(),
+                "settings": settings,
+                "started": time.time(),
+            },
+            mode="w",
+        )
+
+    def record(self, point: SweepPoint, labels: list, files: list[str]) -> None:
+        self._append(
+            {
+                "type": "point",
+                "step": point.step,
+                "index": list(point.index),
+                "labels": labels,
+                "files": files,
+                "completed": time.time(),
+            }
+        )
+
+    # failed points are kept for the record but are not completed, so a resume
+    # measures them again.
+    def record_failure(self, point: SweepPoint, error: str) -> None:
+        self._append(
+            {
+                "type": "failed",
+                "step": point.step,
+                "index": list(point.index),
+                "error": error,
+                "failed": time.time(),
+            }
+        )
+
+    def load(self) -> tuple[SweepPlan, dict, dict]:
+        plan = None
+        settings = dict()
+        completed = dict()
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by the crash, everything before it is intact.
+                    break
+                if entry["type"] == "plan":
+                    plan = SweepPlan.from_dict(entry["plan"])
+                    settings = entry["settings"]
+                elif entry["type"] == "point":
+                    completed[tuple(entry["index"])] = entry
+
+        if plan is None:
+            raise ValueError(f"{self.path} does not contain a sweep plan")
+        return plan, settings, completed
+
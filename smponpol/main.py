@@ -2,29 +2,60 @@ from smponpol.utils import (
     find_instruments,
     lcd_instruments,
     lcd_state,
-    read_temperature,
+    start_hotstage_scheduler,
     handle_measurement_status,
     connect_to_instruments_callback,
     start_measurement,
+    resume_measurement,
     stop_measurement,
     take_data,
+    close_instruments,
+    refresh_browser,
+    browse_point,
+    apply_waveform,
+    change_frequency,
+    generator_values,
 )
+from smponpol.async_instruments import get_instrument_loop
 from smponpol.themes import generate_global_theme
+from smponpol.session import get_session
+from smponpol.rigs import Rig
+from smponpol.monitor import MonitorServer
 import dearpygui.dearpygui as dpg
-from smponpol.ui import lcd_ui, VIEWPORT_WIDTH, DRAW_HEIGHT
+from smponpol.ui import lcd_ui
+import argparse
 import threading
 from pathlib import Path
 import importlib
 import ctypes
 
 
-def find_instruments_thread(frontend: lcd_ui):
-    thread = threading.Thread(target=find_instruments, args=(frontend,))
+def find_instruments_thread(frontend: lcd_ui, rig: Rig | None = None):
+    thread = threading.Thread(target=find_instruments, args=(frontend, rig))
     thread.daemon = True
     thread.start()
 
 
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SMPontaneous Polarisation")
+    parser.add_argument("--rig", help="name of the rig, when started by smponpol.rigs")
+    parser.add_argument("--hotstage", default="")
+    parser.add_argument("--agilent", default="")
+    parser.add_argument("--oscilloscope", default="")
+    parser.add_argument(
+        "--monitor",
+        type=int,
+        metavar="PORT",
+        help="stream the sweep to viewers on localhost:PORT",
+    )
+    return parser.parse_args()
+
+
 def main():
+    args = parse_arguments()
+    rig = None
+    if args.rig is not None:
+        rig = Rig(args.rig, args.hotstage, args.agilent, args.oscilloscope)
     dpg.create_context()
     ctypes.windll.shcore.SetProcessDpiAwareness(2)
     user32 = ctypes.windll.user32
@@ -32,7 +63,7 @@ def main():
 
     MODULE_PATH = importlib.resources.files(__package__)
     dpg.create_viewport(
-        title="SMPontaneous Polarisation",
+        title="SMPontaneous Polarisation" + (f" - {rig.name}" if rig else ""),
         width=screensize[0],
         height=screensize[1],
         x_pos=0,
@@ -44,6 +75,11 @@ def main():
     dpg.setup_dearpygui()
     dpg.show_viewport()
 
+    # paint a first frame straight away; fonts and windows are built behind it.
+    with dpg.window(no_title_bar=True, no_resize=True, no_move=True) as splash:
+        dpg.add_text("Starting...")
+    dpg.render_dearpygui_frame()
+
     font_path = Path(MODULE_PATH / "assets/OpenSans-Regular.ttf")
     with dpg.font_registry():
         default_font = dpg.add_font(font_path, 18 * screensize[1] / 1080)
@@ -53,12 +89,18 @@ def main():
     dpg.bind_font(default_font)
 
     state = lcd_state()
+    state.rig = rig.name if rig else None
+    if args.monitor is not None:
+        state.monitor = MonitorServer(port=args.monitor)
+        get_instrument_loop().submit(state.monitor.start())
     frontend = lcd_ui()
     instruments = lcd_instruments()
+    dpg.delete_item(splash)
 
     dpg.bind_item_font(frontend.wfg_title, title_font)
     # dpg.bind_item_font(frontend.scope_title, title_font)
     dpg.bind_item_font(frontend.output_title, title_font)
+    dpg.bind_item_font(frontend.acquisition_title, title_font)
 
     dpg.bind_item_font(frontend.measurement_status, status_font)
     dpg.bind_item_font(frontend.status_label, status_font)
@@ -91,20 +133,12 @@ def main():
         state = not state
 
         if state:
-            instruments.agilent.set_output("OFF")
+            get_instrument_loop().submit(instruments.agilent.set_output("OFF"))
             dpg.configure_item(sender, label="Turn output on")
         else:
-            match dpg.get_value(frontend.selected_waveform):
-                case "Sine":
-                    waveform = "SIN"
-                case "Square":
-                    waveform = "SQU"
-                case "Triangle":
-                    waveform = "TRI"
-                case "User":
-                    waveform = "USER"
-            instruments.set_waveform(waveform)
-            instruments.agilent.set_output("ON")
+            values = generator_values(frontend)
+            get_instrument_loop().submit(apply_waveform(instruments, values))
+            get_instrument_loop().submit(instruments.agilent.set_output("ON"))
             dpg.configure_item(sender, label="Turn output off")
 
         # Apply the appropriate theme
@@ -123,9 +157,7 @@ def main():
     # )
     dpg.configure_item(
         frontend.frequency_input,
-        callback=lambda: instruments.agilent.set_frequency(
-            dpg.get_value(frontend.frequency_input)
-        ),
+        callback=lambda: change_frequency(frontend, instruments, state),
         on_enter=True,
     )
 
@@ -151,6 +183,11 @@ def main():
         callback=lambda: start_measurement(state, frontend, instruments),
     )
 
+    dpg.configure_item(
+        frontend.resume_button,
+        callback=lambda: resume_measurement(state, frontend, instruments),
+    )
+
     dpg.configure_item(
         frontend.stop_button,
         callback=lambda: stop_measurement(instruments, state, frontend),
@@ -158,15 +195,34 @@ def main():
 
     dpg.configure_item(
         frontend.go_to_temp_button,
-        callback=lambda: instruments.hotstage.ramp(
-            dpg.get_value(frontend.go_to_temp_input),
-            dpg.get_value(frontend.T_rate),
+        callback=lambda: get_instrument_loop().submit(
+            instruments.hotstage_scheduler.ramp(
+                dpg.get_value(frontend.go_to_temp_input),
+                dpg.get_value(frontend.T_rate),
+            )
         ),
     )
 
     dpg.configure_item(
         frontend.autoscale_scope_button,
-        callback=lambda: instruments.oscilloscope.autoscale(),
+        callback=lambda: get_instrument_loop().submit(
+            instruments.oscilloscope.autoscale()
+        ),
+    )
+
+    for history_control in [frontend.history_channel, frontend.history_offset]:
+        dpg.configure_item(
+            history_control,
+            callback=lambda: frontend.draw_history(state.trace_history),
+        )
+
+    for browser_control in [frontend.browser_refresh, frontend.browser_run]:
+        dpg.configure_item(
+            browser_control, callback=lambda: refresh_browser(frontend, state)
+        )
+    dpg.configure_item(
+        frontend.browser_points,
+        callback=lambda sender, app_data: browse_point(frontend, state, app_data),
     )
 
     dpg.configure_item(
@@ -177,21 +233,13 @@ def main():
     dpg.bind_theme(generate_global_theme())
     dpg.bind_item_theme(frontend.wfg_output_on_button, enabled_theme)
     # Search for instruments using a thread so GUI isn't blocked.
-    thread = threading.Thread(target=find_instruments, args=(frontend,))
-    thread.daemon = True
-    thread.start()
-
-    find_instruments_thread(frontend)
+    find_instruments_thread(frontend, rig)
 
-    hotstage_thread = threading.Thread(
-        target=read_temperature, args=(frontend, instruments, state)
-    )
-    hotstage_thread.daemon = True
     viewport_width = dpg.get_viewport_client_width()
     viewport_height = dpg.get_viewport_client_height()
 
     while dpg.is_dearpygui_running():
-        # check if hotstage is connected. If it is, start thread to poll temperature.
+        # check if hotstage is connected. If it is, start polling the temperature.
         if (
             viewport_width != dpg.get_viewport_client_width()
             or viewport_height != dpg.get_viewport_client_height()
@@ -202,7 +250,9 @@ def main():
             frontend.draw_children(viewport_width, viewport_height)
 
         if state.hotstage_connection_status == "Connected":
-            hotstage_thread.start()
+            get_instrument_loop().submit(
+                start_hotstage_scheduler(frontend, instruments, state)
+            )
             state.hotstage_connection_status = "Reading"
 
         if (
@@ -214,18 +264,19 @@ def main():
             dpg.configure_item(frontend.output_controls_after_init_group, show=True)
 
         handle_measurement_status(state, frontend, instruments)
+        if state.monitor is not None:
+            state.monitor.publish_status(
+                state.measurement_status.name,
+                state.sweep_step if state.sweep is not None else None,
+            )
 
         dpg.render_dearpygui_frame()
 
-    if instruments.hotstage:
-        instruments.hotstage.stop()
-        instruments.hotstage.close()
-    if instruments.agilent:
-        # instruments.agilent.reset_and_clear()
-        instruments.agilent.set_output("OFF")
-        instruments.agilent.close()
-    if instruments.oscilloscope:
-        instruments.oscilloscope.close()
+    get_instrument_loop().submit(close_instruments(instruments)).result(timeout=30)
+    if state.monitor is not None:
+        get_instrument_loop().submit(state.monitor.close()).result(timeout=5)
+    get_instrument_loop().stop()
+    get_session().close_all()
 
     dpg.destroy_context()
 
@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+
+DEFAULT_PORT = 8765
+# traces are cut down to about this many points before they are sent.
+MAX_TRACE_POINTS = 1000
+# messages waiting per viewer; a viewer that falls further behind loses the oldest.
+CLIENT_QUEUE_SIZE = 64
+# a viewer that accepts nothing for this long (s) is disconnected.
+DRAIN_TIMEOUT = 5.0
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+
+# binary trace frame: header, then float32 time, channel1, channel2, channel3.
+TRACE_HEADER = struct.Struct("<iHI")  # step (-1 for single shots), channels, points
+
+
+def encode_frame(payload: bytes, opcode: int) -> bytes:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 2**16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def encode_trace(step: int | None, result: dict) -> bytes:
+    import numpy as np
+
+    channels = [result["time"], result["channel1"], result["channel2"], result["channel3"]]
+    points = len(channels[0])
+    stride = max(-(-points // MAX_TRACE_POINTS), 1)
+    data = np.stack([np.asarray(x, dtype=np.float32)[::stride] for x in channels])
+    step = -1 if step is None else step
+    return TRACE_HEADER.pack(step, len(data), data.shape[1]) + data.tobytes()
+
+
+def decode_trace(payload: bytes) -> "tuple[int, np.ndarray]":
+    import numpy as np
+
+    step, channels, points = TRACE_HEADER.unpack_from(payload)
+    data = np.frombuffer(payload, dtype=np.float32, offset=TRACE_HEADER.size)
+    return step, data.reshape(channels, points)
+
+
+# Read-only view of a running sweep for a browser or `python -m smponpol.monitor`
+# on the same PC; it only listens on localhost. Serves GET /status as JSON and
+# pushes status changes, stage temperatures and decimated traces over a WebSocket
+# at /stream. It runs on the instrument loop and never waits long on a viewer:
+# every viewer has its own bounded queue, the oldest messages are dropped when it
+# falls behind, and a viewer that stops reading altogether is disconnected.
+class MonitorServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> None:
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.server = None
+        self.clients = set()
+        self.snapshot = {"status": None, "temperature": None, "step": None}
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        for queue in self.clients:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    # the publish methods may be called from any thread.
+    def publish_status(self, status: str, step: int | None) -> None:
+        if status == self.snapshot["status"] and step == self.snapshot["step"]:
+            return
+        self.snapshot["status"] = status
+        self.snapshot["step"] = step
+        self.publish(
+            TEXT, json.dumps({"type": "status", "status": status, "step": step})
+        )
+
+    def publish_temperature(self, sample_time: float, temperature: float) -> None:
+        self.snapshot["temperature"] = temperature
+        self.publish(
+            TEXT,
+            json.dumps(
+                {"type": "temperature", "time": sample_time, "temperature": temperature}
+            ),
+        )
+
+    def publish_trace(self, step: int | None, result: dict) -> None:
+        # nothing is encoded unless someone is watching.
+        if self.clients:
+            self.publish(BINARY, encode_trace(step, result))
+
+    def publish(self, opcode: int, payload: str | bytes) -> None:
+        if self.loop is None or not self.clients:
+            return
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.loop.call_soon_threadsafe(self.broadcast, encode_frame(payload, opcode))
+
+    def broadcast(self, frame: bytes) -> None:
+        for queue in self.clients:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(frame)
+
+    async def handle(self, reader, writer) -> None:
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            path = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else ""
+            headers = {
+                key.strip().lower(): value.strip()
+                for key, _, value in (line.partition(":") for line in lines[1:] if line)
+            }
+
+            if path == "/status":
+                body = json.dumps(self.snapshot).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+            elif path == "/stream" and "sec-websocket-key" in headers:
+                await self.stream(reader, writer, headers["sec-websocket-key"])
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            await asyncio.wait_for(writer.drain(), DRAIN_TIMEOUT)
+        except (
+            asyncio.IncompleteReadError,
+            ConnectionError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, reader, writer, key: str) -> None:
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            + f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+
+        queue = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        queue.put_nowait(
+            encode_frame(json.dumps({"type": "snapshot"} | self.snapshot).encode(), TEXT)
+        )
+        self.clients.add(queue)
+        # viewers only ever close; anything else they send is ignored.
+        listener = asyncio.create_task(self.wait_for_close(reader, queue))
+        try:
+            while (frame := await queue.get()) is not None:
+                writer.write(frame)
+                await asyncio.wait_for(writer.drain(), DRAIN_TIMEOUT)
+            writer.write(encode_frame(b"", CLOSE))
+        finally:
+            self.clients.discard(queue)
+            listener.cancel()
+
+    async def wait_for_close(self, reader, queue: asyncio.Queue) -> None:
+        try:
+            while (await read_frame(reader))[0] != CLOSE:
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+async def watch(host: str, port: int) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        f"GET /stream HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+        f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    await reader.readuntil(b"\r\n\r\n")
+    while True:
+        opcode, payload = await read_frame(reader)
+        if opcode == TEXT:
+            print(payload.decode())
+        elif opcode == BINARY:
+            step, data = decode_trace(payload)
+            print(f"trace step {step}: {data.shape[1]} points, {len(data) - 1} channels")
+        elif opcode == CLOSE:
+            break
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Follow a running sweep.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(watch(args.host, args.port))
+    except (KeyboardInterrupt, ConnectionError, asyncio.IncompleteReadError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
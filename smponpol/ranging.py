@@ -0,0 +1,48 @@
+import math
+import numpy as np
+
+DIVISIONS = 8
+# fraction of the screen the next trace should fill, leaving room for it to grow.
+HEADROOM = 0.8
+# samples this close to the screen edge count as clipped.
+CLIP_FRACTION = 0.98
+# DS4000 limits at 1X probe attenuation, V/div.
+MIN_SCALE = 1e-3
+MAX_SCALE = 5.0
+STEPS = (1.0, 2.0, 5.0)
+
+
+def nice_scale(scale: float) -> float:
+    # smallest 1-2-5 step that is at least `scale`.
+    scale = min(max(scale, MIN_SCALE), MAX_SCALE)
+    decade = 10 ** math.floor(math.log10(scale))
+    for step in STEPS + (10.0,):
+        if step * decade >= scale * (1 - 1e-9):
+            return min(step * decade, MAX_SCALE)
+    return MAX_SCALE
+
+
+def plan_range(low: float, high: float, headroom: float = HEADROOM):
+    scale = nice_scale((high - low) / (DIVISIONS * headroom))
+    # the screen centre sits at -offset.
+    offset = -(high + low) / 2 + 0.0  # no -0.0 on the wire
+    return scale, offset
+
+
+def is_clipped(data, scale: float, offset: float) -> bool:
+    data = np.asarray(data)
+    edge = DIVISIONS / 2 * scale * CLIP_FRACTION
+    centre = -offset
+    return bool(data.max() >= centre + edge or data.min() <= centre - edge)
+
+
+# Range for the next capture: the measured extremes normally, but a clipped trace
+# only shows a lower bound on its size, so the screen is widened past it.
+def next_range(data, scale: float, offset: float):
+    data = np.asarray(data)
+    low, high = float(data.min()), float(data.max())
+    if is_clipped(data, scale, offset):
+        centre = -offset
+        half = DIVISIONS / 2 * scale * 2
+        low, high = min(low, centre - half), max(high, centre + half)
+    return plan_range(low, high)
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+# USB vendor IDs, as used by find_instruments.
+RIGOL_VENDOR = "0x1AB1"
+AGILENT_VENDOR = "0x0957"
+INSTEC_VENDOR = "0x03EB"
+
+
+@dataclass
+class Rig:
+    name: str
+    hotstage: str = ""
+    agilent: str = ""
+    oscilloscope: str = ""
+
+    def arguments(self) -> list[str]:
+        return [
+            "--rig",
+            self.name,
+            "--hotstage",
+            self.hotstage,
+            "--agilent",
+            self.agilent,
+            "--oscilloscope",
+            self.oscilloscope,
+        ]
+
+
+# addresses of each kind of instrument, in the order VISA lists them.
+def instrument_addresses(visa_resources) -> dict[str, list[str]]:
+    usb_selector = [x for x in visa_resources if x.split("::")[0] == "USB0"]
+    return {
+        "hotstage": [x for x in usb_selector if x.split("::")[1] == INSTEC_VENDOR],
+        "agilent": [x for x in usb_selector if x.split("::")[1] == AGILENT_VENDOR],
+        "oscilloscope": [x for x in usb_selector if x.split("::")[1] == RIGOL_VENDOR],
+    }
+
+
+# Without a config file, instruments are paired up in address order. That is only
+# right if every rig is plugged in the same way, so check `--list` first.
+def discover_rigs() -> list[Rig]:
+    from smponpol.session import get_session
+
+    addresses = {
+        name: sorted(found)
+        for name, found in instrument_addresses(
+            get_session().list_resources("?*")
+        ).items()
+    }
+    count = min(len(found) for found in addresses.values())
+    return [
+        Rig(
+            f"rig{i + 1}",
+            addresses["hotstage"][i],
+            addresses["agilent"][i],
+            addresses["oscilloscope"][i],
+        )
+        for i in range(count)
+    ]
+
+
+def load_rigs(path: str) -> list[Rig]:
+    with open(path, "r") as f:
+        return [Rig(**rig) for rig in json.load(f)]
+
+
+# Every rig runs the full application in its own process and working directory,
+# so each has its own VISA session, instrument loop and output files, and a slow
+# or crashed rig never holds up the others.
+def launch(rig: Rig, root: Path) -> subprocess.Popen:
+    directory = root / rig.name
+    directory.mkdir(parents=True, exist_ok=True)
+    # the working directory changes, so keep a source checkout importable.
+    env = os.environ.copy()
+    package_root = str(Path(__file__).resolve().parents[1])
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")])
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "smponpol"] + rig.arguments(), cwd=directory, env=env
+    )
+
+
+def supervise(rigs: list[Rig], root: Path) -> None:
+    processes = {rig.name: launch(rig, root) for rig in rigs}
+    print(f"Started {', '.join(processes)}")
+    try:
+        while processes:
+            for name, process in list(processes.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                del processes[name]
+                if code == 0:
+                    print(f"{name} closed")
+                else:
+                    print(f"{name} exited with code {code}, the other rigs keep running")
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run several rigs side by side, one process per rig."
+    )
+    parser.add_argument(
+        "--config",
+        help='JSON list of {"name", "hotstage", "agilent", "oscilloscope"}',
+    )
+    parser.add_argument(
+        "--root", default=".", help="each rig writes into <root>/<rig name>"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="print the rigs and exit"
+    )
+    args = parser.parse_args()
+
+    rigs = load_rigs(args.config) if args.config else discover_rigs()
+    if not rigs:
+        print("No complete rigs found")
+        sys.exit(1)
+
+    if args.list:
+        print(json.dumps([asdict(rig) for rig in rigs], indent=4))
+        return
+
+    supervise(rigs, Path(args.root))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+# one catalogue per user, shared by every run, so queries can span runs.
+DEFAULT_INDEX_PATH = Path(
+    os.environ.get("SMPONPOL_RUN_INDEX", Path.home() / ".smponpol" / "runs.sqlite")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    output_path TEXT,
+    started REAL,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS points (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT REFERENCES runs (run_id),
+    step INTEGER,
+    labels TEXT,
+    temperature REAL,
+    voltage REAL,
+    frequency REAL,
+    waveform TEXT,
+    t_start REAL,
+    t_end REAL,
+    recorded REAL,
+    file_path TEXT,
+    file_offset INTEGER,
+    file_length INTEGER,
+    ps REAL
+);
+CREATE INDEX IF NOT EXISTS points_by_frequency ON points (frequency, temperature);
+CREATE INDEX IF NOT EXISTS points_by_time ON points (recorded);
+CREATE INDEX IF NOT EXISTS points_by_run ON points (run_id, step);
+"""
+
+
+class RunIndex:
+    def __init__(self, path: str | Path = DEFAULT_INDEX_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self.lock = threading.Lock()
+        # points are added from the acquisition worker threads.
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+
+    def start_run(self, output_path: str, settings: dict) -> str:
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?)",
+                (run_id, output_path, time.time(), json.dumps(settings)),
+            )
+        return run_id
+
+    def add_point(
+        self,
+        run_id: str | None,
+        step: int | None,
+        labels: list,
+        values: dict,
+        file_path: str,
+        t_start: float | None = None,
+        t_end: float | None = None,
+        ps: float | None = None,
+    ) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO points (run_id, step, labels, temperature, voltage,"
+                " frequency, waveform, t_start, t_end, recorded, file_path,"
+                " file_offset, file_length, ps)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    step,
+                    json.dumps(labels),
+                    values.get("temperature"),
+                    values.get("voltage"),
+                    values.get("frequency"),
+                    values.get("waveform"),
+                    t_start,
+                    t_end,
+                    time.time(),
+                    os.path.abspath(file_path),
+                    0,
+                    os.path.getsize(file_path),
+                    ps,
+                ),
+            )
+
+    def query(
+        self,
+        run_id: str | None = None,
+        frequency: float | None = None,
+        t_min: float | None = None,
+        t_max: float | None = None,
+        voltage: float | None = None,
+        waveform: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+    ) -> list[sqlite3.Row]:
+        conditions = []
+        parameters = []
+        for clause, value in [
+            ("run_id = ?", run_id),
+            ("abs(frequency - ?) < 1e-6", frequency),
+            ("temperature >= ?", t_min),
+            ("temperature <= ?", t_max),
+            ("abs(voltage - ?) < 1e-6", voltage),
+            ("waveform = ?", waveform),
+            ("recorded >= ?", since),
+            ("recorded <= ?", until),
+        ]:
+            if value is not None:
+                conditions.append(clause)
+                parameters.append(value)
+
+        sql = "SELECT * FROM points"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY recorded"
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def runs(self, limit: int = 50) -> list[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT * FROM runs ORDER BY started DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def points(self, run_id: str) -> list[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT * FROM points WHERE run_id = ? ORDER BY step, recorded",
+                (run_id,),
+            ).fetchall()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query acquired points across runs.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--run")
+    parser.add_argument("--frequency", type=float)
+    parser.add_argument("--voltage", type=float)
+    parser.add_argument("--waveform")
+    parser.add_argument("--t-min", type=float)
+    parser.add_argument("--t-max", type=float)
+    parser.add_argument("--since", help="ISO date, e.g. 2024-05-01")
+    parser.add_argument("--until", help="ISO date")
+    args = parser.parse_args()
+
+    index = RunIndex(args.index)
+    rows = index.query(
+        run_id=args.run,
+        frequency=args.frequency,
+        t_min=args.t_min,
+        t_max=args.t_max,
+        voltage=args.voltage,
+        waveform=args.waveform,
+        since=datetime.fromisoformat(args.since).timestamp() if args.since else None,
+        until=datetime.fromisoformat(args.until).timestamp() if args.until else None,
+    )
+    for row in rows:
+        print(
+            f"{row['run_id']}\t{row['temperature']} C\t{row['voltage']} V"
+            f"\t{row['frequency']} Hz\t{row['waveform']}\t{row['file_path']}"
+        )
+    print(f"{len(rows)} points")
+
+
+if __name__ == "__main__":
+    main()
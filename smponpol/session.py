@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# reconnect attempts made on a VISA I/O error before the error is raised to the caller.
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+
+
+class InstrumentAborted(Exception):
+    pass
+
+
+class ManagedResource:
+    def __init__(self, session, address: str, settings: dict) -> None:
+        self.session = session
+        self.address = address
+        self.settings = dict(settings)
+        self.lock = threading.RLock()
+        self.resource = None
+        # transactions in progress on each thread; calls inside one are not retried.
+        self.local = threading.local()
+        # threads whose operation overran its deadline, refused any further I/O.
+        self.abandoned = set()
+        # the link is closed and has to be opened again before it is used.
+        self.stale = False
+        self.open()
+
+    def open(self) -> None:
+        self.resource = self.session.resource_manager.open_resource(self.address)
+        self.apply_settings()
+
+    def apply_settings(self, **settings) -> None:
+        self.settings.update(settings)
+        for key, value in self.settings.items():
+            setattr(self.resource, key, value)
+
+    # Called from another thread when an operation overruns its deadline, so it
+    # does not take the lock the stuck call is holding. Closing the session ends
+    # that call with an error, or at the latest when its VISA timeout expires, and
+    # the link is opened again by the next transaction from a live thread.
+    def abort(self, thread: threading.Thread) -> None:
+        self.abandoned.add(thread)
+        self.stale = True
+        try:
+            self.resource.close()
+        except Exception:
+            pass
+
+    # If the link cannot be opened again yet (e.g. the device is still coming
+    # back after a USB glitch) it stays stale, so the next transaction retries the
+    # open instead of using the closed handle.
+    def reconnect(self) -> None:
+        with self.lock:
+            self.stale = True
+            try:
+                self.resource.close()
+            except Exception:
+                pass
+            self.open()
+            self.stale = False
+
+    # Runs a whole exchange with the instrument, e.g. a command and the replies to
+    # it. On an I/O error the link is reconnected and the exchange starts again
+    # from its first write, so a read never waits on a fresh connection for the
+    # reply to a command that was sent on the old one.
+    def transaction(self, exchange, *args, **kwargs):
+        import pyvisa
+
+        # an abandoned operation must not touch the instrument after recovery.
+        if threading.current_thread() in self.abandoned:
+            raise InstrumentAborted(f"operation on {self.address} was abandoned")
+        if getattr(self.local, "depth", 0) > 0:
+            return exchange(*args, **kwargs)
+
+        delay = RETRY_BACKOFF
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                with self.lock:
+                    if self.stale:
+                        self.open()
+                        self.stale = False
+                    self.local.depth = 1
+                    try:
+                        return exchange(*args, **kwargs)
+                    finally:
+                        self.local.depth = 0
+            except pyvisa.errors.VisaIOError as e:
+                if threading.current_thread() in self.abandoned:
+                    raise InstrumentAborted(
+                        f"operation on {self.address} was abandoned"
+                    ) from e
+                if attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                logger.warning(
+                    "I/O error on %s, reconnecting in %ss: %s", self.address, delay, e
+                )
+                time.sleep(delay)
+                delay *= 2
+                try:
+                    self.reconnect()
+                except pyvisa.errors.VisaIOError:
+                    pass
+
+    def call(self, method: str, *args, **kwargs):
+        return self.transaction(
+            lambda: getattr(self.resource, method)(*args, **kwargs)
+        )
+
+    def write(self, message: str):
+        return self.call("write", message)
+
+    def write_raw(self, message: bytes):
+        return self.call("write_raw", message)
+
+    def read(self) -> str:
+        return self.call("read")
+
+    def read_raw(self) -> bytes:
+        return self.call("read_raw")
+
+    def query(self, message: str) -> str:
+        return self.call("query", message)
+
+    def query_binary_values(self, message: str, **kwargs):
+        return self.call("query_binary_values", message, **kwargs)
+
+    def write_binary_values(self, message: str, values, **kwargs):
+        return self.call("write_binary_values", message, values, **kwargs)
+
+    def clear(self) -> None:
+        self.call("clear")
+
+    # The link stays open in the session's pool, so connecting to the same address
+    # again does not go through the VISA backend; close_all() ends it.
+    def close(self) -> None:
+        pass
+
+
+class VisaSession:
+    def __init__(self) -> None:
+        self._resource_manager = None
+        self.pool = {}
+        self.lock = threading.Lock()
+
+    # pyvisa and its backend are only loaded when the first instrument is opened.
+    @property
+    def resource_manager(self):
+        if self._resource_manager is None:
+            import pyvisa
+
+            self._resource_manager = pyvisa.ResourceManager()
+        return self._resource_manager
+
+    def list_resources(self, query: str = "?*::INSTR") -> tuple[str, ...]:
+        with self.lock:
+            return self.resource_manager.list_resources(query)
+
+    def open(self, address: str, **settings) -> ManagedResource:
+        with self.lock:
+            handle = self.pool.get(address)
+            if handle is None:
+                handle = ManagedResource(self, address, settings)
+                self.pool[address] = handle
+            else:
+                handle.apply_settings(**settings)
+            return handle
+
+    def close_all(self) -> None:
+        with self.lock:
+            for handle in self.pool.values():
+                try:
+                    handle.resource.close()
+                except Exception:
+                    pass
+            self.pool = {}
+            if self._resource_manager is not None:
+                self._resource_manager.close()
+                self._resource_manager = None
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> VisaSession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = VisaSession()
+        return _session
@@ -0,0 +1,46 @@
+import asyncio
+
+# seconds allowed for one acquisition at a sweep point, scope averaging included.
+ACQUIRE_DEADLINE = 60.0
+RECOVER_DEADLINE = 30.0
+ACQUIRE_ATTEMPTS = 2
+
+
+class AcquisitionFailed(Exception):
+    pass
+
+
+# Run an instrument operation under a deadline. After a timeout or an error the
+# instruments are recovered and the operation is tried again, up to `attempts`
+# times, so a dropped trigger costs minutes at most rather than the whole night.
+# Cancelling a task does not stop I/O already running in a driver thread, so on a
+# timeout `abort` is called first to cut the stuck call off at the link.
+async def supervise(
+    operation,
+    recover,
+    deadline: float = ACQUIRE_DEADLINE,
+    attempts: int = ACQUIRE_ATTEMPTS,
+    abort=None,
+):
+    error = None
+    for attempt in range(attempts):
+        try:
+            return await asyncio.wait_for(operation(), deadline)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"no result within {deadline}s")
+            if abort is not None:
+                abort()
+        except Exception as e:
+            error = e
+        print(f"Acquisition attempt {attempt + 1}/{attempts} failed: ", error)
+
+        try:
+            await asyncio.wait_for(recover(), RECOVER_DEADLINE)
+        except asyncio.TimeoutError:
+            print(f"Could not recover instruments within {RECOVER_DEADLINE}s")
+            if abort is not None:
+                abort()
+        except Exception as e:
+            print("Could not recover instruments: ", e)
+
+    raise AcquisitionFailed(f"gave up after {attempts} attempts: {error}") from error
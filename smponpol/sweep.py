@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+import itertools
+
+
+@dataclass
+class SweepAxis:
+    name: str
+    values: list
+
+
+@dataclass
+class SweepPoint:
+    step: int
+    index: tuple
+    values: dict = field(default_factory=dict)
+
+
+# Axes nest in the order they are given, outermost (slowest to change) first.
+# Settings that are not swept go in constants; they are merged into every
+# point's values but do not add a level to the result layout.
+class SweepPlan:
+    def __init__(self, axes: list[SweepAxis], constants: dict | None = None) -> None:
+        self.constants = dict(constants or {})
+        for axis in axes:
+            if len(axis.values) == 0:
+                raise ValueError(f"Sweep axis '{axis.name}' has no values")
+        self.axes = list(axes)
+        self.points = [
+            SweepPoint(
+                step,
+                index,
+                self.constants
+                | {axis.name: axis.values[i] for axis, i in zip(self.axes, index)},
+            )
+            for step, index in enumerate(
+                itertools.product(*[range(len(axis.values)) for axis in self.axes])
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __getitem__(self, step: int) -> SweepPoint:
+        return self.points[step]
+
+    def axis(self, name: str) -> SweepAxis | None:
+        for axis in self.axes:
+            if axis.name == name:
+                return axis
+        return None
+
+    # compared against the step `previous`, or everything when there is nothing
+    # to compare against (no previous step applied yet).
+    def changed_axes(self, step: int, previous: int | None = None) -> set[str]:
+        if previous is None or previous < 0:
+            return {axis.name for axis in self.axes}
+        previous = self.points[previous].index
+        current = self.points[step].index
+        return {
+            axis.name
+            for axis, i, j in zip(self.axes, previous, current)
+            if i != j
+        }
+
+    # the steps from `step` to the end of the innermost axis, i.e. the points that
+    # only differ in the innermost value (normally the voltage list at one T).
+    def inner_run(self, step: int) -> list[int]:
+        outer = self.points[step].index[:-1]
+        run = []
+        while step < len(self.points) and self.points[step].index[:-1] == outer:
+            run.append(step)
+            step += 1
+        return run
+
+    def labels(self, point: SweepPoint) -> list[str]:
+        return [
+            f"{i + 1}: {axis.values[i]}" for axis, i in zip(self.axes, point.index)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "axes": [{"name": a.name, "values": a.values} for a in self.axes],
+            "constants": self.constants,
+        }
+
+    @classmethod
+    def from_dict(cls, plan: dict):
+        return cls(
+            [SweepAxis(a["name"], a["values"]) for a in plan["axes"]],
+            plan.get("constants"),
+        )
+
+
+class ResultStore:
+    def __init__(self, plan: SweepPlan) -> None:
+        self.plan = plan
+        self.points = dict()
+        self.labels = dict()
+
+    def __contains__(self, index: tuple) -> bool:
+        return index in self.points
+
+    def __getitem__(self, index: tuple) -> dict:
+        return self.points[index]
+
+    # points that are not part of the plan (e.g. continuous ramp acquisitions)
+    # pass their own labels.
+    def add(self, point: SweepPoint, result: dict, labels: list | None = None) -> None:
+        self.points[point.index] = result
+        self.labels[point.index] = labels or self.plan.labels(point)
+
+    # nested by axis label, e.g. {"1: 25.0": {"1: 1.0": {...}}}, matching the
+    # layout results.json has always had for temperature x voltage sweeps.
+    def nested(self) -> dict:
+        nested = dict()
+        for index, result in self.points.items():
+            level = nested
+            labels = self.labels[index]
+            for label in labels[:-1]:
+                level = level.setdefault(label, dict())
+            level[labels[-1]] = result
+        return nested
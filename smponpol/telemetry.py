@@ -0,0 +1,55 @@
+import bisect
+
+
+# Timestamped stage temperatures, appended by the hotstage scheduler. Samples
+# arrive in time order, so any window is found by binary search without
+# touching the link.
+class TelemetryBuffer:
+    def __init__(self, capacity: int = 20000) -> None:
+        self.capacity = capacity
+        self.times = []
+        self.temperatures = []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, sample_time: float, temperature: float) -> None:
+        self.times.append(sample_time)
+        self.temperatures.append(temperature)
+        # trim in chunks so appending stays O(1) amortised.
+        if len(self.times) > 2 * self.capacity:
+            del self.times[: self.capacity]
+            del self.temperatures[: self.capacity]
+
+    def window(self, start: float, end: float) -> dict:
+        return window_statistics(self.times, self.temperatures, start, end)
+
+
+def window_statistics(
+    times: list[float], temperatures: list[float], start: float, end: float
+) -> dict:
+    if len(times) == 0:
+        return {
+            "mean": float("nan"),
+            "min": float("nan"),
+            "max": float("nan"),
+            "drift": float("nan"),
+            "samples": 0,
+        }
+
+    first = bisect.bisect_left(times, start)
+    last = bisect.bisect_right(times, end)
+    window = temperatures[first:last]
+    samples = len(window)
+
+    # captures shorter than the poll period can fall between samples, use the nearest one.
+    if samples == 0:
+        window = [temperatures[min(first, len(temperatures) - 1)]]
+
+    return {
+        "mean": sum(window) / len(window),
+        "min": min(window),
+        "max": max(window),
+        "drift": window[-1] - window[0],
+        "samples": samples,
+    }
@@ -0,0 +1,89 @@
+import math
+from dataclasses import dataclass
+
+HORIZONTAL_DIVISIONS = 14
+# DS4000 memory depths with both channels of a pair on (CH1 and CH2 here). The
+# single channel depths are twice these.
+MEMORY_DEPTHS = (7000, 70000, 700000, 7000000, 70000000)
+# deeper records make the transfer at every point much slower.
+MAX_DEPTH = 70000
+MAX_SAMPLE_RATE = 2e9
+MIN_SCALE = 1e-9
+MAX_SCALE = 1000.0
+MIN_HOLDOFF = 1e-7
+MAX_HOLDOFF = 10.0
+# how far before the next period boundary the trigger re-arms.
+HOLDOFF_MARGIN = 0.1
+DEFAULT_CYCLES = 4
+DEFAULT_SAMPLES_PER_CYCLE = 1000
+STEPS = (1.0, 2.0, 5.0)
+
+
+@dataclass(frozen=True)
+class TimebasePlan:
+    scale: float  # s/div
+    memory_depth: int
+    holdoff: float  # s
+    cycles: float  # periods on screen
+    samples_per_cycle: float
+
+    @property
+    def trigger_interval(self) -> float:
+        # longest time between averaged triggers: the rest of the record or the
+        # holdoff, then the pre-trigger half screen and up to a period for the edge.
+        screen = self.scale * HORIZONTAL_DIVISIONS
+        return max(self.holdoff, screen / 2) + screen / 2 + screen / self.cycles
+
+
+def nice_timebase(scale: float) -> float:
+    # smallest 1-2-5 step that is at least `scale`.
+    scale = min(max(scale, MIN_SCALE), MAX_SCALE)
+    decade = 10 ** math.floor(math.log10(scale))
+    for step in STEPS + (10.0,):
+        if step * decade >= scale * (1 - 1e-9):
+            # rounded so the plan compares equal between points and reads cleanly.
+            return min(float(f"{step * decade:.1g}"), MAX_SCALE)
+    return MAX_SCALE
+
+
+# Timebase, memory depth and holdoff for a drive frequency. The screen holds at
+# least `cycles` periods, and the shallowest memory giving `samples_per_cycle`
+# is used, since every extra point is paid for again in each transfer.
+def plan_timebase(
+    frequency: float,
+    cycles: float = DEFAULT_CYCLES,
+    samples_per_cycle: int = DEFAULT_SAMPLES_PER_CYCLE,
+    max_depth: int = MAX_DEPTH,
+) -> TimebasePlan:
+    if frequency <= 0:
+        raise ValueError(f"Cannot plan a timebase for {frequency} Hz")
+    period = 1 / frequency
+    scale = nice_timebase(cycles * period / HORIZONTAL_DIVISIONS)
+    screen = scale * HORIZONTAL_DIVISIONS
+    screen_cycles = screen / period
+
+    depths = [depth for depth in MEMORY_DEPTHS if depth <= max_depth]
+    memory_depth = depths[-1]
+    for depth in depths:
+        # past the highest sample rate the scope shortens the record itself.
+        if depth >= samples_per_cycle * screen_cycles * (1 - 1e-9) or (
+            depth / screen >= MAX_SAMPLE_RATE
+        ):
+            memory_depth = depth
+            break
+    sample_rate = min(memory_depth / screen, MAX_SAMPLE_RATE)
+
+    # The trigger sits mid screen. Re-arming once the rest of the record is in and
+    # just before a period boundary means pulse trains with several rising edges
+    # per period (PUND) always trigger on the same one.
+    boundaries = math.ceil(screen / 2 * frequency + HOLDOFF_MARGIN)
+    holdoff = (boundaries - HOLDOFF_MARGIN) * period
+    holdoff = min(max(holdoff, MIN_HOLDOFF), MAX_HOLDOFF)
+
+    return TimebasePlan(
+        scale=scale,
+        memory_depth=memory_depth,
+        holdoff=holdoff,
+        cycles=screen_cycles,
+        samples_per_cycle=sample_rate * period,
+    )
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 8
+# samples kept per trace; switching peaks survive because every bucket keeps its
+# minimum and maximum.
+DEFAULT_POINTS = 1000
+
+CHANNELS = ["channel1", "channel2", "channel3"]
+
+
+def decimate(times, data, points: int = DEFAULT_POINTS):
+    import numpy as np
+
+    times = np.asarray(times, dtype=np.float32)
+    data = np.asarray(data, dtype=np.float32)
+    buckets = points // 2
+    if len(data) <= points or buckets < 1:
+        return times, data
+
+    size = len(data) // buckets
+    end = size * buckets
+    shaped = data[:end].reshape(buckets, size)
+    low = shaped.argmin(axis=1)
+    high = shaped.argmax(axis=1)
+    # keep each bucket's extremes in time order.
+    picks = np.sort(np.stack([low, high], axis=1), axis=1) + (
+        np.arange(buckets) * size
+    )[:, None]
+    picks = picks.ravel()
+    return times[picks], data[picks]
+
+
+# The last few traces, cut down to a fixed size, for the history plot. Adding a
+# point only decimates that point; the oldest trace is dropped once the cache is
+# full, so memory does not grow with the length of the sweep.
+class TraceHistory:
+    def __init__(
+        self, capacity: int = DEFAULT_CAPACITY, points: int = DEFAULT_POINTS
+    ) -> None:
+        self.capacity = capacity
+        self.points = points
+        self.traces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.traces)
+
+    def add(self, key, label: str, result: dict) -> None:
+        trace = {"label": label}
+        for channel in CHANNELS:
+            trace[channel] = decimate(result["time"], result[channel], self.points)
+        with self.lock:
+            self.traces[key] = trace
+            self.traces.move_to_end(key)
+            while len(self.traces) > self.capacity:
+                self.traces.popitem(last=False)
+
+    def recent(self, channel: str) -> "list[tuple[str, np.ndarray, np.ndarray]]":
+        with self.lock:
+            traces = list(self.traces.values())
+        return [(trace["label"], *trace[channel]) for trace in traces]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.traces.clear()
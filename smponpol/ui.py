@@ -1,11 +1,10 @@
-import numpy as np
 import dearpygui.dearpygui as dpg
 from smponpol.dataclasses import (
     range_selector_window,
     variable_list,
 )
-import tkinter as tk
-from tkinter import filedialog
+from smponpol.trace_history import DEFAULT_CAPACITY, TraceHistory
+from smponpol.waveforms import DEFAULT_PULSE_WIDTH, PULSE_SHAPES
 import json
 
 
@@ -62,11 +61,18 @@ class lcd_ui:
 
         dpg.configure_item(
             self.voltage_list_window,
-            width=width / 2,
+            width=width / 4,
             height=2 / 5 * height / 2,
             pos=[0, 1 / 5 * height / 2],
         )
 
+        dpg.configure_item(
+            self.frequency_list_window,
+            width=width / 4,
+            height=2 / 5 * height / 2,
+            pos=[width / 4, 1 / 5 * height / 2],
+        )
+
         dpg.configure_item(
             self.temperature_list_window,
             width=width / 2,
@@ -93,6 +99,8 @@ class lcd_ui:
         dpg.configure_item(self.start_button, width=width / 4 - 10, height=-1)
         dpg.configure_item(self.stop_button, width=width / 4 - 10, height=-1)
         dpg.configure_item(self.results_plot_window, height=-1, width=-1)
+        dpg.configure_item(self.history_plot_window, height=-1, width=-1)
+        dpg.configure_item(self.browser_plot_window, height=-1, width=-1)
 
     def _make_graph_windows(self):
         with dpg.window(
@@ -102,40 +110,127 @@ class lcd_ui:
             no_resize=True,
             no_title_bar=True,
         ) as self.results_graph:
-            with dpg.plot(
-                anti_aliased=True,
-            ) as self.results_plot_window:
-                self.results_time_axis = dpg.add_plot_axis(
-                    dpg.mvXAxis, label="time", tag="time_axis"
-                )
-                self.results_V_axis = dpg.add_plot_axis(
-                    dpg.mvYAxis, label="V", tag="V_axis"
-                )
+            with dpg.tab_bar():
+                with dpg.tab(label="Latest"):
+                    with dpg.plot(
+                        anti_aliased=True,
+                    ) as self.results_plot_window:
+                        self.results_time_axis = dpg.add_plot_axis(
+                            dpg.mvXAxis, label="time", tag="time_axis"
+                        )
+                        self.results_V_axis = dpg.add_plot_axis(
+                            dpg.mvYAxis, label="V", tag="V_axis"
+                        )
 
-                self.results_current_axis = dpg.add_plot_axis(
-                    dpg.mvYAxis, label="I", tag="current_axis"
-                )
-                # series belong to a y axis. Note the tag name is used in the update
-                # function update_data
+                        self.results_current_axis = dpg.add_plot_axis(
+                            dpg.mvYAxis, label="I", tag="current_axis"
+                        )
+                        # series belong to a y axis. Note the tag name is used in the
+                        # update function update_data
+
+                        self.results_plot = dpg.add_scatter_series(
+                            x=[],
+                            y=[],
+                            label="Temp",
+                            parent="V_axis",
+                            tag="results_plot",
+                        )
+                        self.results_plot2 = dpg.add_scatter_series(
+                            x=[],
+                            y=[],
+                            label="Temp2",
+                            parent="current_axis",
+                            tag="results_plot2",
+                        )
 
-                self.results_plot = dpg.add_scatter_series(
-                    x=[], y=[], label="Temp", parent="V_axis", tag="results_plot"
-                )
-                self.results_plot2 = dpg.add_scatter_series(
-                    x=[],
-                    y=[],
-                    label="Temp2",
-                    parent="current_axis",
-                    tag="results_plot2",
-                )
+                        self.results_plot3 = dpg.add_scatter_series(
+                            x=[],
+                            y=[],
+                            label="Temp3",
+                            parent="current_axis",
+                            tag="results_plot3",
+                        )
 
-                self.results_plot3 = dpg.add_scatter_series(
-                    x=[],
-                    y=[],
-                    label="Temp3",
-                    parent="current_axis",
-                    tag="results_plot3",
-                )
+                with dpg.tab(label="History"):
+                    with dpg.group(horizontal=True):
+                        self.history_channel = dpg.add_combo(
+                            ["channel1", "channel2", "channel3"],
+                            default_value="channel2",
+                            width=150,
+                        )
+                        self.history_offset = dpg.add_input_float(
+                            label="Waterfall offset",
+                            default_value=0.0,
+                            width=150,
+                            on_enter=True,
+                        )
+                    with dpg.plot(
+                        anti_aliased=True,
+                    ) as self.history_plot_window:
+                        dpg.add_plot_legend()
+                        dpg.add_plot_axis(
+                            dpg.mvXAxis, label="time", tag="history_time_axis"
+                        )
+                        self.history_axis = dpg.add_plot_axis(
+                            dpg.mvYAxis, label="", tag="history_axis"
+                        )
+                        # one series per cached trace, reused as traces come and go.
+                        self.history_series = [
+                            dpg.add_line_series(x=[], y=[], parent=self.history_axis)
+                            for _ in range(DEFAULT_CAPACITY)
+                        ]
+
+                with dpg.tab(label="Browser"):
+                    with dpg.group(horizontal=True):
+                        self.browser_run = dpg.add_combo([], label="Run", width=250)
+                        self.browser_refresh = dpg.add_button(label="Refresh")
+                    with dpg.group(horizontal=True):
+                        self.browser_points = dpg.add_listbox([], width=300, num_items=12)
+                        with dpg.plot(
+                            anti_aliased=True,
+                        ) as self.browser_plot_window:
+                            dpg.add_plot_axis(
+                                dpg.mvXAxis, label="time", tag="browser_time_axis"
+                            )
+                            dpg.add_plot_axis(
+                                dpg.mvYAxis, label="V", tag="browser_V_axis"
+                            )
+                            dpg.add_plot_axis(
+                                dpg.mvYAxis, label="I", tag="browser_current_axis"
+                            )
+                            self.browser_plot = dpg.add_scatter_series(
+                                x=[], y=[], parent="browser_V_axis"
+                            )
+                            self.browser_plot2 = dpg.add_scatter_series(
+                                x=[], y=[], parent="browser_current_axis"
+                            )
+                            self.browser_plot3 = dpg.add_scatter_series(
+                                x=[], y=[], parent="browser_current_axis"
+                            )
+
+    def draw_history(self, history: TraceHistory):
+        traces = history.recent(dpg.get_value(self.history_channel))
+        offset = dpg.get_value(self.history_offset)
+        for i, series in enumerate(self.history_series):
+            if i < len(traces):
+                label, times, data = traces[i]
+                # newest trace at the bottom, older ones stacked above it.
+                shift = offset * (len(traces) - 1 - i)
+                dpg.set_value(series, [times.tolist(), (data + shift).tolist()])
+                dpg.configure_item(series, label=label, show=True)
+            else:
+                dpg.configure_item(series, show=False)
+        dpg.fit_axis_data("history_time_axis")
+        dpg.fit_axis_data("history_axis")
+
+    def draw_browser_trace(self, trace: dict):
+        times = trace["time"].tolist()
+        dpg.set_value(self.browser_plot, [times, trace["channel1"].tolist()])
+        dpg.set_value(self.browser_plot2, [times, trace["channel2"].tolist()])
+        dpg.set_value(self.browser_plot3, [times, trace["channel3"].tolist()])
+        dpg.fit_axis_data("browser_time_axis")
+        dpg.fit_axis_data("browser_V_axis")
+        dpg.fit_axis_data("browser_current_axis")
 
     def _make_status_window(self):
         with dpg.window(
@@ -226,9 +321,26 @@ class lcd_ui:
                         self.wfg_output_on_button = dpg.add_button(
                             label="Turn output on"
                         )
+                    # used when the waveform is "User"; amplitudes are then peak-to-peak.
+                    with dpg.table_row():
+                        dpg.add_text("User shape:")
+                        self.user_shape = dpg.add_combo(
+                            list(PULSE_SHAPES), default_value="PUND", width=-1
+                        )
+                        dpg.add_text("Pulse width (period):")
+                        self.pulse_width = dpg.add_input_float(
+                            default_value=DEFAULT_PULSE_WIDTH,
+                            min_value=0.01,
+                            max_value=1.0,
+                            min_clamped=True,
+                            max_clamped=True,
+                            step=0.01,
+                            width=-1,
+                        )
 
                 self.output_title = dpg.add_text("Output settings")
                 with dpg.table(header_row=False):
+                    dpg.add_table_column()
                     dpg.add_table_column()
                     dpg.add_table_column()
                     with dpg.table_row():
@@ -244,12 +356,112 @@ class lcd_ui:
                             ),
                             width=-1,
                         )
+                        self.resume_button = dpg.add_button(
+                            label="Resume", width=-1
+                        )
+
+                self.acquisition_title = dpg.add_text("Acquisition settings")
+                with dpg.group(horizontal=True):
+                    self.voltage_series = dpg.add_checkbox(
+                        label="Fast voltage series"
+                    )
+                    self.segmented_capture = dpg.add_checkbox(
+                        label="Segmented voltage capture"
+                    )
+                with dpg.table(header_row=False):
+                    dpg.add_table_column()
+                    dpg.add_table_column()
+                    dpg.add_table_column()
+                    dpg.add_table_column()
+                    with dpg.table_row():
+                        self.host_averaging = dpg.add_checkbox(label="Host averaging")
+                        dpg.add_text("Max shots:")
+                        self.max_shots = dpg.add_input_int(
+                            default_value=16, step=0, step_fast=0, width=-1
+                        )
+                    with dpg.table_row():
+                        dpg.add_text("")
+                        dpg.add_text("Target noise (V):")
+                        self.target_noise = dpg.add_input_double(
+                            default_value=0.0,
+                            step=0,
+                            step_fast=0,
+                            format="%.2e",
+                            width=-1,
+                        )
+                    with dpg.table_row():
+                        self.fold_cycles = dpg.add_checkbox(label="Fold cycles")
+                        dpg.add_text("Phase bins:")
+                        self.phase_bins = dpg.add_input_int(
+                            default_value=256, step=0, step_fast=0, width=-1
+                        )
+                    with dpg.table_row():
+                        dpg.add_text("")
+                        dpg.add_text("Scope averages:")
+                        self.scope_averages = dpg.add_combo(
+                            ["2", "4", "8", "16", "32", "64", "128", "256"],
+                            default_value="64",
+                            width=-1,
+                        )
+                    with dpg.table_row():
+                        dpg.add_text("Current gain (A/V):")
+                        self.current_gain = dpg.add_input_double(
+                            default_value=1.0,
+                            step=0,
+                            step_fast=0,
+                            format="%.3e",
+                            width=-1,
+                        )
+                        dpg.add_text("Electrode area (cm²):")
+                        self.electrode_area = dpg.add_input_double(
+                            default_value=1.0,
+                            step=0,
+                            step_fast=0,
+                            format="%.3e",
+                            width=-1,
+                        )
+                    with dpg.table_row():
+                        self.auto_range = dpg.add_checkbox(label="Auto vertical range")
+                        dpg.add_text("Lock-in harmonics:")
+                        self.harmonics = dpg.add_input_int(
+                            default_value=5, step=0, step_fast=0, width=-1
+                        )
+                    with dpg.table_row():
+                        dpg.add_text("Cycles on screen:")
+                        self.cycles = dpg.add_input_int(
+                            default_value=4, step=0, step_fast=0, width=-1
+                        )
+                        dpg.add_text("Samples per cycle:")
+                        self.samples_per_cycle = dpg.add_input_int(
+                            default_value=1000, step=0, step_fast=0, width=-1
+                        )
+                    with dpg.table_row():
+                        dpg.add_text("Target Ps error (µC/cm²):")
+                        self.target_ps_error = dpg.add_input_double(
+                            default_value=0.0,
+                            step=0,
+                            step_fast=0,
+                            format="%.2e",
+                            width=-1,
+                        )
 
             with dpg.window(
                 label="Voltage List", no_collapse=True, no_close=True, no_resize=True
             ) as self.voltage_list_window:
                 self.volt_list = variable_list(*make_variable_list_frame(1.0, 0.01, 20))
 
+            with dpg.window(
+                label="Frequency List (Hz)",
+                no_collapse=True,
+                no_close=True,
+                no_resize=True,
+            ) as self.frequency_list_window:
+                self.freq_list = variable_list(
+                    *make_variable_list_frame(1000.0, 20, 20000)
+                )
+                # left empty, sweeps use the generator frequency instead.
+                dpg.configure_item(self.freq_list.list_handle, items=[])
+
             with dpg.window(
                 label="Temperature List",
                 no_collapse=True,
@@ -293,6 +505,19 @@ class lcd_ui:
                                     step_fast=0,
                                     format="%.2f",
                                 )
+                            with dpg.table_row():
+                                self.continuous_ramp = dpg.add_checkbox(
+                                    label="Continuous ramp"
+                                )
+                            with dpg.table_row():
+                                dpg.add_text("Ramp rate (°C/min): ")
+                                self.continuous_ramp_rate = dpg.add_input_double(
+                                    default_value=0.5,
+                                    width=100,
+                                    step=0,
+                                    step_fast=0,
+                                    format="%.2f",
+                                )
 
             with dpg.window(
                 no_title_bar=True, no_resize=True
@@ -318,6 +543,9 @@ class lcd_ui:
                     )
 
     def open_tkinter_saveas_file_picker(self, type, object_to_serialise=None):
+        import tkinter as tk
+        from tkinter import filedialog
+
         root = tk.Tk()
         root.withdraw()
         if type == "output":
@@ -359,6 +587,9 @@ class lcd_ui:
         self.open_tkinter_saveas_file_picker("settings", measurement_settings)
 
     def load_measurement_settings(self):
+        import tkinter as tk
+        from tkinter import filedialog
+
         root = tk.Tk()
         root.withdraw()
         filename = filedialog.askopenfilename(
@@ -404,6 +635,8 @@ def del_value_from_list_callback(sender, app_data, user_data):
 
 
 def append_range_to_list_callback(sender, app_data, user_data):
+    import numpy as np
+
     current_list = dpg.get_item_configuration(user_data["listbox_handle"])["items"]
 
     if (
@@ -451,6 +684,8 @@ def append_range_to_list_callback(sender, app_data, user_data):
 
 
 def replace_list_callback(sender, app_data, user_data):
+    import numpy as np
+
     if (
         dpg.get_value(user_data["range_selector"].spacing_combo)
         == "Number of Points (Linear)"
@@ -1,13 +1,44 @@
 import dearpygui.dearpygui as dpg
 from smponpol.ui import lcd_ui
 from smponpol.dataclasses import lcd_instruments, lcd_state, Status
-from smponpol.instruments import Agilent33220A, Instec, Rigol4204
+from smponpol.async_instruments import (
+    AsyncAgilent33220A,
+    AsyncInstec,
+    AsyncRigol4204,
+    get_instrument_loop,
+)
+from smponpol.session import get_session
+from smponpol.sweep import SweepAxis, SweepPlan, SweepPoint, ResultStore
+from smponpol.journal import SweepJournal
+from smponpol.run_index import RunIndex
+from smponpol.hotstage_scheduler import HotstageScheduler
+from smponpol.browser import load_data_file, neighbours
+from smponpol.waveforms import user_waveform
+from smponpol.timebase import plan_timebase
+from smponpol.rigs import Rig, instrument_addresses
+from smponpol.supervisor import ACQUIRE_DEADLINE, AcquisitionFailed, supervise
+import asyncio
 import json
-import pyvisa
+import math
+import os
+import sqlite3
 import time
-import threading
 
-# TODO: find a way to handle exceptions in instrument threads?
+# the applied voltage and the current monitor; channel 3 is left as set up.
+AUTO_RANGE_CHANNELS = (1, 2)
+WAVEFORMS = {"Sine": "SIN", "Square": "SQU", "Triangle": "TRI", "User": "USER"}
+# one capture plus retakes after clipping.
+AUTO_RANGE_ATTEMPTS = 3
+# scope averaging runs this much longer than its triggers should take.
+AVERAGING_MARGIN = 1.5
+MIN_AVERAGING_WAIT = 0.5
+# without a planned timebase there is nothing to size the wait from.
+DEFAULT_AVERAGING_WAIT = 5.0
+# leaves room for the transfers within the acquisition deadline.
+MAX_AVERAGING_WAIT = 30.0
+# how long one triggered capture may wait without a planned timebase.
+DEFAULT_TRIGGER_TIMEOUT = 10.0
+MIN_TRIGGER_TIMEOUT = 1.0
 
 
 def write_handler(instrument, command_string):
@@ -17,9 +48,105 @@ def write_handler(instrument, command_string):
         print(f"Could not write {command_string} to {instrument}: ", e)
 
 
-def start_measurement(
-    state: lcd_state, frontend: lcd_ui, instruments: lcd_instruments
+def read_acquisition_settings(frontend: lcd_ui, state: lcd_state) -> None:
+    state.acquisition.host_averaging = dpg.get_value(frontend.host_averaging)
+    state.acquisition.max_shots = max(dpg.get_value(frontend.max_shots), 1)
+    state.acquisition.target_noise = dpg.get_value(frontend.target_noise)
+    state.acquisition.scope_averages = int(dpg.get_value(frontend.scope_averages))
+    state.acquisition.fold_cycles = dpg.get_value(frontend.fold_cycles)
+    state.acquisition.phase_bins = max(dpg.get_value(frontend.phase_bins), 1)
+    state.acquisition.current_gain = dpg.get_value(frontend.current_gain)
+    state.acquisition.electrode_area = dpg.get_value(frontend.electrode_area)
+    state.acquisition.harmonics = max(dpg.get_value(frontend.harmonics), 0)
+    state.acquisition.auto_range = dpg.get_value(frontend.auto_range)
+    state.acquisition.cycles = max(dpg.get_value(frontend.cycles), 0)
+    state.acquisition.samples_per_cycle = max(
+        dpg.get_value(frontend.samples_per_cycle), 1
+    )
+    state.acquisition.target_ps_error = max(dpg.get_value(frontend.target_ps_error), 0)
+
+
+def open_run_index(state: lcd_state) -> None:
+    if state.run_index is not None:
+        return
+    try:
+        state.run_index = RunIndex()
+    except sqlite3.Error as e:
+        print("Could not open the run index, points will not be catalogued: ", e)
+
+
+def index_point(
+    state: lcd_state,
+    run_id: str | None,
+    step: int | None,
+    labels: list,
+    values: dict,
+    data_file: str,
+    result: dict,
 ) -> None:
+    if state.run_index is None:
+        return
+    try:
+        capture = result.get("capture", {})
+        state.run_index.add_point(
+            run_id,
+            step,
+            labels,
+            values,
+            data_file,
+            t_start=capture.get("wall_start"),
+            t_end=capture.get("wall_end"),
+            ps=result.get("ps"),
+        )
+    except sqlite3.Error as e:
+        print(f"Could not index {data_file}: ", e)
+
+
+def point_description(row) -> str:
+    description = (
+        f"{row['temperature']:.2f} C, {row['voltage']:.2f} V, {row['frequency']:.1f} Hz"
+    )
+    if row["waveform"]:
+        description += f", {row['waveform']}"
+    return description
+
+
+def refresh_browser(frontend: lcd_ui, state: lcd_state) -> None:
+    open_run_index(state)
+    if state.run_index is None:
+        return
+    runs = [row["run_id"] for row in state.run_index.runs()]
+    dpg.configure_item(frontend.browser_run, items=runs)
+
+    run_id = dpg.get_value(frontend.browser_run)
+    if run_id not in runs:
+        run_id = state.run_id if state.run_id in runs else (runs[0] if runs else "")
+        dpg.set_value(frontend.browser_run, run_id)
+
+    state.browser_points = state.run_index.points(run_id) if run_id else []
+    # numbered, so points measured twice still get distinct entries.
+    state.browser_labels = [
+        f"{i + 1}: {point_description(row)}"
+        for i, row in enumerate(state.browser_points)
+    ]
+    dpg.configure_item(frontend.browser_points, items=state.browser_labels)
+
+
+def browse_point(frontend: lcd_ui, state: lcd_state, label: str) -> None:
+    if label not in state.browser_labels:
+        return
+    index = state.browser_labels.index(label)
+    paths = [row["file_path"] for row in state.browser_points]
+    try:
+        trace = state.trace_reader.load(paths[index])
+    except (OSError, ValueError) as e:
+        print(f"Could not read {paths[index]}: ", e)
+        return
+    frontend.draw_browser_trace(trace)
+    state.trace_reader.prefetch([paths[i] for i in neighbours(index, len(paths))])
+
+
+def deactivate_start_button(frontend: lcd_ui) -> None:
     dpg.configure_item(frontend.start_button, enabled=False)
     with dpg.theme() as DEACTIVATED_THEME:
         with dpg.theme_component(dpg.mvAll):
@@ -28,6 +155,27 @@ def start_measurement(
             )
     dpg.bind_item_theme(frontend.start_button, DEACTIVATED_THEME)
 
+
+def empty_list(frontend: lcd_ui) -> str | None:
+    for name, values in [
+        ("voltage", frontend.volt_list),
+        ("temperature", frontend.temperature_list),
+    ]:
+        if len(dpg.get_item_configuration(values.list_handle)["items"]) == 0:
+            return f"The {name} list is empty"
+    return None
+
+
+def start_measurement(
+    state: lcd_state, frontend: lcd_ui, instruments: lcd_instruments
+) -> None:
+    error = empty_list(frontend)
+    if error is not None:
+        dpg.set_value(frontend.measurement_status, error)
+        return
+    deactivate_start_button(frontend)
+    read_acquisition_settings(frontend, state)
+
     state.T_list = [
         float(x.split("\t")[-1])
         for x in dpg.get_item_configuration(frontend.temperature_list.list_handle)[
@@ -40,71 +188,223 @@ def start_measurement(
         for x in dpg.get_item_configuration(frontend.volt_list.list_handle)["items"]
     ]
 
+    state.freq_list = [
+        float(x.split("\t")[-1])
+        for x in dpg.get_item_configuration(frontend.freq_list.list_handle)["items"]
+    ]
+
     state.T_list = [round(x, 2) for x in state.T_list]
 
-    # instruments.agilent.set_voltage(dpg.get_value(frontend.voltage_input))
-    instruments.agilent.set_frequency(dpg.get_value(frontend.frequency_input))
-
-    match dpg.get_value(frontend.selected_waveform):
-        case "Sine":
-            waveform = "SIN"
-        case "Square":
-            waveform = "SQU"
-        case "Triangle":
-            waveform = "TRI"
-        case "User":
-            waveform = "USER"
-    instruments.agilent.set_waveform(waveform)
-
-    instruments.agilent.set_output("OFF")
-
-    state.T_step = 0
-    state.voltage_step = 0
-
-    T_str = f"{state.T_step + 1}: {state.T_list[state.T_step]}"
-    v_str = f"{state.voltage_step + 1}: {state.voltage_list[state.voltage_step]}"
-
-    state.resultsDict[T_str] = dict()
-    state.resultsDict[T_str][v_str] = dict()
-    state.resultsDict[T_str][v_str]["time"] = []
-    state.resultsDict[T_str][v_str]["channel1"] = []
-    state.resultsDict[T_str][v_str]["channel2"] = []
-    state.resultsDict[T_str][v_str]["channel3"] = []
+    waveform = WAVEFORMS[dpg.get_value(frontend.selected_waveform)]
+
+    state.continuous_ramp = dpg.get_value(frontend.continuous_ramp)
+    # outermost first: the hotstage moves once per temperature, the generator
+    # frequency once per voltage list, and the voltage series runs innermost.
+    axes = []
+    constants = {"waveform": waveform}
+    if waveform == "USER":
+        constants["user_shape"] = dpg.get_value(frontend.user_shape)
+        constants["pulse_width"] = dpg.get_value(frontend.pulse_width)
+    # a continuous ramp settles at the first temperature, then repeats the rest of
+    # the plan back to back while the stage ramps to the last one.
+    if state.continuous_ramp:
+        constants["temperature"] = state.T_list[0]
+        state.ramp_end = state.T_list[-1]
+        state.ramp_pass = 0
+    else:
+        axes.append(SweepAxis("temperature", state.T_list))
+    # an empty frequency list means the sweep runs at the frequency set in the generator panel.
+    if len(state.freq_list) > 0:
+        axes.append(SweepAxis("frequency", state.freq_list))
+    else:
+        constants["frequency"] = dpg.get_value(frontend.frequency_input)
+    axes.append(SweepAxis("voltage", state.voltage_list))
+
+    state.sweep = SweepPlan(axes, constants)
+    state.sweep_step = 0
+    state.applied_step = None
+    state.results = ResultStore(state.sweep)
+    state.failed_points = dict()
+    settings = {
+        "continuous_ramp": state.continuous_ramp,
+        "ramp_end": state.ramp_end,
+        "T_rate": dpg.get_value(frontend.T_rate),
+        "stab_time": dpg.get_value(frontend.stab_time),
+        "rig": state.rig,
+    }
+    open_run_index(state)
+    state.run_id = None
+    if state.run_index is not None:
+        state.run_id = state.run_index.start_run(
+            dpg.get_value(frontend.output_file_path), settings
+        )
+    settings["run_id"] = state.run_id
+
+    state.journal = SweepJournal(
+        SweepJournal.path_for(dpg.get_value(frontend.output_file_path))
+    )
+    state.journal.start(state.sweep, settings)
+
+    get_instrument_loop().submit(setup_generator(instruments, state.sweep[0].values))
 
     state.measurement_status = Status.SET_TEMPERATURE
+    state.trace_history.clear()
+    state.vertical_ranges = dict()
+    state.timebase = None
     state.xdata = []
     state.ydata = []
 
 
+def resume_measurement(
+    state: lcd_state, frontend: lcd_ui, instruments: lcd_instruments
+) -> None:
+    output_file_path = dpg.get_value(frontend.output_file_path)
+    journal = SweepJournal(SweepJournal.path_for(output_file_path))
+    try:
+        plan, settings, completed = journal.load()
+    except (OSError, ValueError) as e:
+        dpg.set_value(frontend.measurement_status, f"Nothing to resume: {e}")
+        return
+    if settings.get("continuous_ramp"):
+        dpg.set_value(
+            frontend.measurement_status, "Continuous ramp runs cannot be resumed"
+        )
+        return
+
+    try:
+        with open(output_file_path, "r") as f:
+            saved = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        saved = dict()
+
+    results = ResultStore(plan)
+    for point in plan.points:
+        if point.index not in completed:
+            continue
+        entry = completed[point.index]
+        result = saved
+        for label in entry["labels"]:
+            result = result.get(label, {}) if isinstance(result, dict) else {}
+        # results.json can lag the journal by the point that was being written.
+        if "time" not in result:
+            trace = load_data_file(entry["files"][0])
+            result = {name: values.tolist() for name, values in trace.items()}
+        results.add(point, result, entry["labels"])
+
+    remaining = [point.step for point in plan.points if point.index not in results]
+    if len(remaining) == 0:
+        dpg.set_value(frontend.measurement_status, "Sweep already complete")
+        return
+
+    deactivate_start_button(frontend)
+    read_acquisition_settings(frontend, state)
+    if "T_rate" in settings:
+        dpg.set_value(frontend.T_rate, settings["T_rate"])
+    if "stab_time" in settings:
+        dpg.set_value(frontend.stab_time, settings["stab_time"])
+    state.continuous_ramp = False
+    state.sweep = plan
+    state.results = results
+    state.failed_points = dict()
+    state.sweep_step = remaining[0]
+    state.applied_step = None
+    state.timebase = None
+    state.journal = journal
+    state.run_id = settings.get("run_id")
+    open_run_index(state)
+
+    get_instrument_loop().submit(
+        setup_generator(instruments, state.current_point.values)
+    )
+    state.measurement_status = Status.SET_TEMPERATURE
+
+
+async def setup_generator(instruments: lcd_instruments, values: dict) -> None:
+    # instruments.agilent.set_voltage(dpg.get_value(frontend.voltage_input))
+    await instruments.agilent.set_frequency(values["frequency"])
+    await apply_waveform(instruments, values)
+    await instruments.agilent.set_output("OFF")
+
+
+def change_frequency(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
+) -> None:
+    read_acquisition_settings(frontend, state)
+    get_instrument_loop().submit(
+        set_drive_frequency(
+            instruments, state, dpg.get_value(frontend.frequency_input)
+        )
+    )
+
+
+async def set_drive_frequency(
+    instruments: lcd_instruments, state: lcd_state, frequency: float
+) -> None:
+    await instruments.agilent.set_frequency(frequency)
+    if instruments.oscilloscope:
+        await apply_timebase(instruments, state, frequency)
+
+
+# Matches the scope's timebase, memory depth and trigger holdoff to the drive
+# frequency. Only sent when the plan changes, since each change restarts averaging.
+async def apply_timebase(
+    instruments: lcd_instruments, state: lcd_state, frequency: float
+) -> None:
+    if state.acquisition.cycles <= 0:
+        return
+    plan = plan_timebase(
+        frequency, state.acquisition.cycles, state.acquisition.samples_per_cycle
+    )
+    if plan == state.timebase:
+        return
+    await instruments.oscilloscope.set_horizontal(
+        plan.scale, plan.memory_depth, plan.holdoff
+    )
+    state.timebase = plan
+
+
+async def apply_waveform(instruments: lcd_instruments, values: dict) -> None:
+    if values["waveform"] == "USER" and "user_shape" in values:
+        dac = user_waveform(values["user_shape"], values["pulse_width"])
+        await instruments.agilent.set_user_waveform(dac)
+    else:
+        await instruments.agilent.set_waveform(values["waveform"])
+
+
 def stop_measurement(
     instruments: lcd_instruments, state: lcd_state, frontend: lcd_ui
 ) -> None:
-    instruments.hotstage.stop()
+    get_instrument_loop().submit(instruments.hotstage_scheduler.stop())
     state.measurement_status = Status.IDLE
 
 
-def init_agilent(
+async def init_agilent(
     frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
 ) -> None:
+    address = dpg.get_value(frontend.agilent_com_selector)
     if instruments.agilent:
-        instruments.agilent.close()
-    agilent = Agilent33220A(dpg.get_value(frontend.agilent_com_selector))
+        # the pooled handle survives close(), so force a fresh link when reconnecting.
+        if instruments.agilent.wfg.address == address:
+            await instruments.agilent.run(instruments.agilent.wfg.reconnect)
+        await instruments.agilent.close()
+    agilent = await AsyncAgilent33220A.connect(address)
     dpg.set_value(frontend.agilent_status, "Connected")
-    agilent.set_output("OFF")
+    await agilent.set_output("OFF")
     # dpg.configure_item(frontend.agilent_initialise, label = "Reconnect")
     instruments.agilent = agilent
     state.agilent_connection_status = "Connected"
 
 
-def init_oscilloscope(
+async def init_oscilloscope(
     frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
 ) -> None:
+    address = dpg.get_value(frontend.oscilloscope_com_selector)
     if instruments.oscilloscope:
-        instruments.oscilloscope.close()
+        if instruments.oscilloscope.scope.address == address:
+            await instruments.oscilloscope.run(instruments.oscilloscope.scope.reconnect)
+        await instruments.oscilloscope.close()
 
-    instruments.oscilloscope = Rigol4204(
-        dpg.get_value(frontend.oscilloscope_com_selector)
-    )
+    instruments.oscilloscope = await AsyncRigol4204.connect(address)
     dpg.set_value(frontend.oscilloscope_status, "Connected")
     # dpg.configure_item(frontend.oscilloscope_initialise, label = "Reconnect")
 
@@ -113,15 +413,21 @@ def init_oscilloscope(
     # instruments.oscilloscope.init_scope_defaults()
 
 
-def init_hotstage(
+async def init_hotstage(
     frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
 ) -> None:
-    hotstage = Instec(dpg.get_value(frontend.hotstage_com_selector))
+    import pyvisa
+
+    hotstage = await AsyncInstec.connect(
+        dpg.get_value(frontend.hotstage_com_selector)
+    )
     try:
-        hotstage.get_temperature()
+        await hotstage.get_temperature()
         dpg.set_value(frontend.hotstage_status, "Connected")
         # dpg.hide_item(frontend.hotstage_initialise)
         instruments.hotstage = hotstage
+        # commands queue up here until polling starts.
+        instruments.hotstage_scheduler = HotstageScheduler(hotstage)
         state.hotstage_connection_status = "Connected"
         with open("address.dat", "w") as f:
             f.write(dpg.get_value(frontend.hotstage_com_selector))
@@ -131,29 +437,12 @@ def init_hotstage(
 
 
 def connect_to_instruments_callback(sender, app_data, user_data):
-    hotstage_thread = threading.Thread(
-        target=init_hotstage,
-        args=(user_data["frontend"], user_data["instruments"], user_data["state"]),
-    )
-
-    hotstage_thread.daemon = True
-    hotstage_thread.start()
-
-    agilent_thread = threading.Thread(
-        target=init_agilent,
-        args=(user_data["frontend"], user_data["instruments"], user_data["state"]),
-    )
-
-    agilent_thread.daemon = True
-    agilent_thread.start()
-
-    oscilloscope_thread = threading.Thread(
-        target=init_oscilloscope,
-        args=(user_data["frontend"], user_data["instruments"], user_data["state"]),
-    )
-
-    oscilloscope_thread.daemon = True
-    oscilloscope_thread.start()
+    args = (user_data["frontend"], user_data["instruments"], user_data["state"])
+    # each instrument has its own I/O worker, so the three connections proceed concurrently.
+    loop = get_instrument_loop()
+    loop.submit(init_hotstage(*args))
+    loop.submit(init_agilent(*args))
+    loop.submit(init_oscilloscope(*args))
 
     dpg.hide_item(user_data["frontend"].init_instruments_group)
     dpg.show_item(user_data["frontend"].output_controls_after_init_group)
@@ -177,17 +466,19 @@ def handle_measurement_status(
                 )
         dpg.bind_item_theme(frontend.start_button, START_THEME)
     elif state.measurement_status == Status.SET_TEMPERATURE:
-        instruments.hotstage.ramp(
-            state.T_list[state.T_step], dpg.get_value(frontend.T_rate)
+        target = state.current_point.values["temperature"]
+        get_instrument_loop().submit(
+            instruments.hotstage_scheduler.ramp(target, dpg.get_value(frontend.T_rate))
         )
         state.measurement_status = Status.GOING_TO_TEMPERATURE
         dpg.set_value(
             frontend.measurement_status,
-            f"Going to {state.T_list[state.T_step]}°C\tT: {state.hotstage_temperature:.2f}°C",
+            f"Going to {target}°C\tT: {state.hotstage_temperature:.2f}°C",
         )
     elif state.measurement_status == Status.GOING_TO_TEMPERATURE and (
-        state.hotstage_temperature > state.T_list[state.T_step] - 0.1
-        and state.hotstage_temperature < state.T_list[state.T_step] + 0.1
+        state.hotstage_temperature > state.current_point.values["temperature"] - 0.1
+        and state.hotstage_temperature
+        < state.current_point.values["temperature"] + 0.1
     ):
         state.t_stable_start = time.time()
         state.measurement_status = Status.STABILISING_TEMPERATURE
@@ -195,7 +486,7 @@ def handle_measurement_status(
     elif state.measurement_status == Status.GOING_TO_TEMPERATURE:
         dpg.set_value(
             frontend.measurement_status,
-            f"Going to {state.T_list[state.T_step]}°C\tT: {state.hotstage_temperature:.2f}°C",
+            f"Going to {state.current_point.values['temperature']}°C\tT: {state.hotstage_temperature:.2f}°C",
         )
 
     elif state.measurement_status == Status.STABILISING_TEMPERATURE:
@@ -207,53 +498,104 @@ def handle_measurement_status(
         if current_wait >= dpg.get_value(frontend.stab_time):
             state.measurement_status = Status.TEMPERATURE_STABILISED
 
+    elif state.measurement_status == Status.TEMPERATURE_STABILISED and (
+        state.continuous_ramp
+    ):
+        state.measurement_status = Status.RAMP_ACQUIRING
+        loop = get_instrument_loop()
+        loop.submit(
+            instruments.hotstage_scheduler.ramp(
+                state.ramp_end, dpg.get_value(frontend.continuous_ramp_rate)
+            )
+        )
+        submit_measurement(run_ramp_acquisition(frontend, instruments, state), state)
+
+    elif state.measurement_status == Status.TEMPERATURE_STABILISED and (
+        dpg.get_value(frontend.segmented_capture)
+        and state.sweep.axes[-1].name == "voltage"
+    ):
+        state.measurement_status = Status.COLLECTING_DATA
+        submit_measurement(run_segmented_series(frontend, instruments, state), state)
+
+    elif state.measurement_status == Status.TEMPERATURE_STABILISED and (
+        dpg.get_value(frontend.voltage_series)
+        and state.sweep.axes[-1].name == "voltage"
+    ):
+        state.measurement_status = Status.COLLECTING_DATA
+        submit_measurement(run_voltage_series(frontend, instruments, state), state)
+
     elif state.measurement_status == Status.TEMPERATURE_STABILISED:
         state.measurement_status = Status.COLLECTING_DATA
+        state.series_progress = (1, 1)
         take_data(frontend, instruments, state)
 
+    elif state.measurement_status == Status.RAMP_ACQUIRING:
+        dpg.set_value(
+            frontend.measurement_status,
+            f"Ramping to {state.ramp_end}°C, pass {state.ramp_pass + 1}\nT: {state.hotstage_temperature:.2f}°C",
+        )
+
     elif state.measurement_status == Status.COLLECTING_DATA:
         dpg.set_value(
             frontend.measurement_status,
-            f"Taking data at V: {state.voltage_list[state.voltage_step]:.2f}\nT: {state.hotstage_temperature:.2f}°C",
+            f"Taking data at V: {state.current_point.values['voltage']:.2f} ({state.series_progress[0]}/{state.series_progress[1]})"
+            + (f", {len(state.failed_points)} skipped" if state.failed_points else "")
+            + f"\nT: {state.hotstage_temperature:.2f}°C",
         )
 
     elif state.measurement_status == Status.FINISHED:
-        instruments.hotstage.stop()
-        instruments.agilent.set_output("OFF")
+        loop = get_instrument_loop()
+        loop.submit(instruments.hotstage_scheduler.stop())
+        loop.submit(instruments.agilent.set_output("OFF"))
         state.measurement_status = Status.IDLE
         dpg.set_value(
             frontend.measurement_status, f"Idle\tT: {state.hotstage_temperature:.2f}°C"
         )
 
 
-def find_instruments(frontend: lcd_ui):
-    dpg.set_value(frontend.measurement_status, "Finding Instruments...")
-    rm = pyvisa.ResourceManager()
-    visa_resources = rm.list_resources("?*")
-
-    usb_selector = [x for x in visa_resources if x.split("::")[0] == "USB0"]
-
-    rigol_addresses = [x for x in usb_selector if x.split("::")[1] == "0x1AB1"]
-    agilent_addresses = [x for x in usb_selector if x.split("::")[1] == "0x0957"]
-    instec_addresses = [x for x in usb_selector if x.split("::")[1] == "0x03EB"]
-
-    dpg.configure_item(frontend.hotstage_com_selector, items=instec_addresses)
-    dpg.configure_item(frontend.agilent_com_selector, items=agilent_addresses)
-    dpg.configure_item(frontend.oscilloscope_com_selector, items=rigol_addresses)
+async def close_instruments(instruments: lcd_instruments) -> None:
+    if instruments.hotstage:
+        await instruments.hotstage_scheduler.stop()
+        instruments.hotstage_scheduler.close()
+        await instruments.hotstage.close()
+    if instruments.agilent:
+        # instruments.agilent.reset_and_clear()
+        await instruments.agilent.set_output("OFF")
+        await instruments.agilent.close()
+    if instruments.oscilloscope:
+        await instruments.oscilloscope.close()
 
-    dpg.set_value(
-        frontend.hotstage_com_selector,
-        instec_addresses[0] if (len(instec_addresses) > 0) else "",
-    )
-    dpg.set_value(
-        frontend.agilent_com_selector,
-        agilent_addresses[0] if len(agilent_addresses) > 0 else "",
-    )
-    dpg.set_value(
-        frontend.oscilloscope_com_selector,
-        rigol_addresses[0] if len(rigol_addresses) > 0 else "",
-    )
 
+def find_instruments(frontend: lcd_ui, rig: Rig | None = None):
+    dpg.set_value(frontend.measurement_status, "Finding Instruments...")
+    addresses = instrument_addresses(get_session().list_resources("?*"))
+
+    missing = []
+    for name, selector in [
+        ("hotstage", frontend.hotstage_com_selector),
+        ("agilent", frontend.agilent_com_selector),
+        ("oscilloscope", frontend.oscilloscope_com_selector),
+    ]:
+        found = addresses[name]
+        dpg.configure_item(selector, items=found)
+        if rig is None:
+            dpg.set_value(selector, found[0] if len(found) > 0 else "")
+            continue
+        # a rig launched by smponpol.rigs only ever uses its own instruments;
+        # another address here would belong to a different rig.
+        preferred = getattr(rig, name)
+        if preferred in found:
+            dpg.set_value(selector, preferred)
+        else:
+            dpg.set_value(selector, "")
+            missing.append(f"{name} {preferred}")
+
+    if missing:
+        dpg.set_value(
+            frontend.measurement_status,
+            f"{rig.name}: not found: {', '.join(missing)}",
+        )
+        return
     dpg.set_value(frontend.measurement_status, "Found instruments!")
     dpg.set_value(frontend.measurement_status, "Idle")
 
@@ -261,84 +603,536 @@ def find_instruments(frontend: lcd_ui):
 def take_data(
     frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state, single_shot=False
 ) -> None:
-    thread = threading.Thread(
-        target=run_experiment, args=(frontend, instruments, state, single_shot)
+    if single_shot:
+        try:
+            selected_voltage(frontend)
+        except ValueError as e:
+            dpg.set_value(frontend.measurement_status, str(e))
+            return
+        read_acquisition_settings(frontend, state)
+    submit_measurement(
+        run_experiment(frontend, instruments, state, single_shot),
+        state,
+        on_error=Status.IDLE if single_shot else Status.FINISHED,
     )
-    thread.daemon = True
-    thread.start()
 
 
-def run_experiment(
-    frontend: lcd_ui, instruments: lcd_state, state: lcd_state, single_shot=False
+def submit_measurement(coroutine, state: lcd_state, on_error=Status.FINISHED) -> None:
+    # anything the supervisor did not handle ends the sweep rather than leaving
+    # it waiting for a result that will never arrive.
+    def end_on_error(future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            state.measurement_status = on_error
+
+    get_instrument_loop().submit(coroutine).add_done_callback(end_on_error)
+
+
+async def run_experiment(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state, single_shot=False
 ):
     if single_shot:
         state.measurement_status = Status.COLLECTING_DATA
+        voltage = selected_voltage(frontend)
+        frequency = dpg.get_value(frontend.frequency_input)
+    else:
+        voltage = state.current_point.values["voltage"]
+
+    # settings go out inside the deadline too, and again after a recovery.
+    async def operation() -> dict:
+        if single_shot:
+            await apply_timebase(instruments, state, frequency)
+        else:
+            await apply_point_settings(instruments, state)
+        return await acquire(instruments, state, voltage)
+
+    try:
+        result = await supervise(
+            operation,
+            lambda: recover_instruments(instruments, state),
+            deadline=capture_deadline(state),
+            abort=lambda: abort_instruments(instruments),
+        )
+    except AcquisitionFailed as e:
+        if single_shot:
+            print("Could not take data: ", e)
+            state.measurement_status = Status.IDLE
+        else:
+            await asyncio.to_thread(skip_point, state, e)
+        return
+
+    # file writing stays off the event loop so hotstage polling keeps running.
+    await asyncio.to_thread(
+        get_result, result, state, frontend, instruments, single_shot
+    )
+
+
+async def apply_point_settings(instruments: lcd_instruments, state: lcd_state) -> None:
+    point = state.current_point
+    changed = state.sweep.changed_axes(state.sweep_step, state.applied_step)
+    if "frequency" in changed:
+        await instruments.agilent.set_frequency(point.values["frequency"])
+    if "waveform" in changed:
+        await apply_waveform(instruments, point.values)
+    # also covers the first point, where a constant frequency is not a changed axis.
+    await apply_timebase(instruments, state, point.values["frequency"])
+    state.applied_step = state.sweep_step
+
+
+async def recover_instruments(instruments: lcd_instruments, state: lcd_state) -> None:
+    await instruments.agilent.set_output("OFF")
+    await instruments.oscilloscope.recover()
+    # timebase and generator settings are re-sent in case the failure was a reconnect.
+    state.applied_step = None
+    state.timebase = None
+
+
+def abort_instruments(instruments: lcd_instruments) -> None:
+    # the hotstage has its own poll loop and is not part of an acquisition.
+    for driver in (instruments.agilent, instruments.oscilloscope):
+        if driver:
+            driver.abort()
+
+
+async def acquire(
+    instruments: lcd_instruments, state: lcd_state, voltage: float
+) -> dict:
+    await instruments.agilent.set_voltage(voltage)
+    await instruments.agilent.set_output("ON")
+    result = await capture_traces(instruments, state)
+    await instruments.agilent.set_output("OFF")
+    return result
+
+
+def stamp_capture(result: dict, state: lcd_state, start: float, end: float) -> None:
+    # monotonic times match the telemetry buffer, wall times are for the run index.
+    offset = time.time() - time.monotonic()
+    result["capture"] = {
+        "start": start,
+        "end": end,
+        "wall_start": start + offset,
+        "wall_end": end + offset,
+        "temperature": state.telemetry.window(start, end),
+    }
+
+
+# Every auto-range retake is a whole capture of its own, so each one gets a full
+# acquisition deadline.
+def capture_deadline(state: lcd_state) -> float:
+    if state.acquisition.auto_range:
+        return ACQUIRE_DEADLINE * AUTO_RANGE_ATTEMPTS
+    return ACQUIRE_DEADLINE
+
+
+async def capture_traces(instruments: lcd_instruments, state: lcd_state) -> dict:
+    for attempt in range(AUTO_RANGE_ATTEMPTS):
+        start = time.monotonic()
+        if state.acquisition.host_averaging:
+            result = await capture_averaged(instruments, state)
+        else:
+            result = await capture_scope_averaged(instruments, state)
+        stamp_capture(result, state, start, time.monotonic())
+
+        if not state.acquisition.auto_range:
+            break
+        clipped = await auto_range(instruments, state, result)
+        if not clipped:
+            break
+        print(f"Channels {clipped} clipped, taking the point again")
+    return result
+
+
+# Sets each ranged channel for the next capture from this one's extremes. Returns
+# the channels that clipped, which means this capture has to be repeated.
+async def auto_range(
+    instruments: lcd_instruments, state: lcd_state, result: dict
+) -> list[int]:
+    from smponpol.ranging import is_clipped, next_range
+
+    clipped = []
+    for channel in AUTO_RANGE_CHANNELS:
+        if channel not in state.vertical_ranges:
+            state.vertical_ranges[channel] = (
+                await instruments.oscilloscope.get_channel_vertical(channel)
+            )
+        scale, offset = state.vertical_ranges[channel]
+        data = result[f"channel{channel}"]
+
+        planned = next_range(data, scale, offset)
+        # offsets within half a division are left alone so the range settles.
+        if planned[0] == scale and abs(planned[1] - offset) <= scale / 2:
+            continue
+        # a retake only helps if the screen got wider; at the widest range it would
+        # clip again, so the capture is kept.
+        if is_clipped(data, scale, offset) and planned[0] > scale:
+            clipped.append(channel)
+        await instruments.oscilloscope.set_channel_vertical(channel, *planned)
+        state.vertical_ranges[channel] = planned
+    return clipped
+
+
+# Ps and its single shot uncertainty from a pilot capture, and how many repeats
+# bring the uncertainty down to the target.
+def estimate_averaging(state: lcd_state, times, traces: dict, cap: int) -> dict:
+    from smponpol.averaging import repeats_needed
+    from smponpol.hysteresis import ps_uncertainty
+
+    ps, error = ps_uncertainty(
+        times,
+        traces[1],
+        traces[2],
+        state.acquisition.current_gain,
+        state.acquisition.electrode_area,
+    )
+    if not math.isfinite(ps):
+        ps = None
+    return {
+        "ps": ps,
+        "snr": ps / error if ps is not None and error > 0 else None,
+        "shot_error": error,
+        "count": repeats_needed(error, state.acquisition.target_ps_error, cap),
+    }
+
+
+def finish_averaging(averaging: dict, count: int) -> dict:
+    averaging["count"] = count
+    averaging["ps_error"] = averaging["shot_error"] / count**0.5
+    return averaging
+
+
+def averaging_wait(state: lcd_state, averages: int) -> float:
+    if state.timebase is None:
+        return DEFAULT_AVERAGING_WAIT
+    wait = averages * state.timebase.trigger_interval * AVERAGING_MARGIN
+    return max(wait, MIN_AVERAGING_WAIT)
+
+
+def trigger_timeout(state: lcd_state) -> float:
+    if state.timebase is None:
+        return DEFAULT_TRIGGER_TIMEOUT
+    wait = state.timebase.trigger_interval * AVERAGING_MARGIN
+    return max(wait, MIN_TRIGGER_TIMEOUT)
+
+
+# Host-side shots are limited like the scope's averaging count, so that at low
+# frequencies their triggers still fit in the acquisition deadline.
+def shot_limit(state: lcd_state, shots: int) -> int:
+    if state.timebase is None:
+        return shots
+    shot_wait = state.timebase.trigger_interval * AVERAGING_MARGIN
+    return max(min(shots, int(MAX_AVERAGING_WAIT // shot_wait)), 1)
 
-    result = dict()
-    instruments.agilent.set_voltage(state.voltage_list[state.voltage_step])
-    instruments.agilent.set_output("ON")
 
-    times, data = instruments.oscilloscope.get_channel_trace(1)
-    _, data2 = instruments.oscilloscope.get_channel_trace(2)
-    _, data3 = instruments.oscilloscope.get_channel_trace(3)
+async def capture_scope_averaged(
+    instruments: lcd_instruments, state: lcd_state
+) -> dict:
+    from smponpol.averaging import scope_average_count
 
-    instruments.oscilloscope.run()
-    instruments.agilent.set_output("OFF")
+    result = dict()
+    averages = state.acquisition.scope_averages
+    averaging = None
+    if state.acquisition.target_ps_error > 0:
+        times, traces = await instruments.oscilloscope.get_single_capture(
+            (1, 2), trigger_timeout(state)
+        )
+        averaging = estimate_averaging(state, times, traces, averages)
+        averages = scope_average_count(averaging["count"], averages)
+    # at low frequencies the full count would not fit in the deadline.
+    while averages > 2 and averaging_wait(state, averages) > MAX_AVERAGING_WAIT:
+        averages //= 2
+
+    await instruments.oscilloscope.acquire_averaged(
+        averages, min(averaging_wait(state, averages), MAX_AVERAGING_WAIT)
+    )
+    times, data = await instruments.oscilloscope.read_channel_trace(1)
+    _, data2 = await instruments.oscilloscope.read_channel_trace(2)
+    _, data3 = await instruments.oscilloscope.read_channel_trace(3)
+
+    await instruments.oscilloscope.run()
 
     result["time"] = times
     result["channel1"] = data
     result["channel2"] = data2
     result["channel3"] = data3
+    result["averages"] = averages
+    if averaging is not None:
+        result["averaging"] = finish_averaging(averaging, averages)
+    return result
+
+
+async def capture_averaged(instruments: lcd_instruments, state: lcd_state) -> dict:
+    from smponpol.averaging import StreamingAverage
+
+    channels = (1, 2, 3)
+    averages = {channel: StreamingAverage() for channel in channels}
+    shots = shot_limit(state, state.acquisition.max_shots)
+    averaging = None
+    shot = 0
+    while shot < shots:
+        times, traces = await instruments.oscilloscope.get_single_capture(
+            channels, trigger_timeout(state)
+        )
+        for channel in channels:
+            averages[channel].add(traces[channel])
+        shot += 1
+        if state.acquisition.target_ps_error > 0:
+            # the first shot doubles as the pilot capture.
+            if averaging is None:
+                averaging = estimate_averaging(state, times, traces, shots)
+                shots = averaging["count"]
+        # stop as soon as every channel is below the target noise level.
+        elif shot > 1 and all(
+            averages[channel].noise() <= state.acquisition.target_noise
+            for channel in channels
+        ):
+            break
+    await instruments.oscilloscope.run()
 
-    get_result(result, state, frontend, instruments, single_shot)
+    result = dict()
+    result["time"] = times.tolist()
+    for channel in channels:
+        result[f"channel{channel}"] = averages[channel].mean.tolist()
+    result["shots"] = averages[1].count
+    if averaging is not None:
+        result["averaging"] = finish_averaging(averaging, averages[1].count)
+    result["uncertainty"] = {
+        f"channel{channel}": averages[channel].standard_error.tolist()
+        for channel in channels
+    }
+    return result
+
+
+async def run_voltage_series(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
+) -> None:
+    steps = remaining_inner_run(state)
+
+    async def capture_step() -> dict:
+        # only re-sends what changed, i.e. everything after a recovery.
+        await apply_point_settings(instruments, state)
+        # amplitude first, so the output never comes on at the previous series' last.
+        await instruments.agilent.set_voltage(state.current_point.values["voltage"])
+        await instruments.agilent.set_output("ON")
+        return await capture_traces(instruments, state)
+
+    # the output stays on for the whole series; only the amplitude changes.
+    for i, step in enumerate(steps):
+        if state.measurement_status == Status.IDLE:
+            break
+        state.sweep_step = step
+        state.series_progress = (i + 1, len(steps))
+        last = i == len(steps) - 1
+
+        try:
+            result = await supervise(
+                capture_step,
+                lambda: recover_instruments(instruments, state),
+                deadline=capture_deadline(state),
+                abort=lambda: abort_instruments(instruments),
+            )
+        except AcquisitionFailed as e:
+            await instruments.agilent.set_output("OFF")
+            if last:
+                await asyncio.to_thread(skip_point, state, e)
+            else:
+                await asyncio.to_thread(mark_failed, state, state.current_point, e)
+            continue
 
+        if last:
+            await instruments.agilent.set_output("OFF")
+            await asyncio.to_thread(get_result, result, state, frontend, instruments)
+        else:
+            parse_result(result, state, frontend)
+            await asyncio.to_thread(
+                store_result, result, state, frontend, state.current_point
+            )
 
-def read_temperature(frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state):
-    log_time = 0
-    time_step = 0.05
-    while True:
-        temperature = instruments.hotstage.get_temperature()
-        if temperature is None:
-            continue
+    if state.measurement_status == Status.IDLE:
+        await instruments.agilent.set_output("OFF")
+
+
+def remaining_inner_run(state: lcd_state) -> list[int]:
+    return [
+        step
+        for step in state.sweep.inner_run(state.sweep_step)
+        if state.sweep[step].index not in state.results
+    ]
+
+
+async def run_segmented_series(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
+) -> None:
+    steps = remaining_inner_run(state)
+
+    async def capture() -> tuple:
+        state.sweep_step = steps[0]
+        await apply_point_settings(instruments, state)
+        return await capture_segmented(instruments, state, steps)
+
+    try:
+        times, frames, frame_times = await supervise(
+            capture,
+            lambda: recover_instruments(instruments, state),
+            deadline=ACQUIRE_DEADLINE * len(steps),
+            abort=lambda: abort_instruments(instruments),
+        )
+    except AcquisitionFailed as e:
+        # fall back to one capture per voltage, each with its own deadline.
+        print("Segmented capture failed, measuring point by point: ", e)
+        state.sweep_step = steps[0]
+        await run_voltage_series(frontend, instruments, state)
+        return
+
+    if state.measurement_status == Status.IDLE:
+        return
+
+    for i, step in enumerate(steps):
+        state.sweep_step = step
+        result = dict()
+        result["time"] = times.tolist()
+        result["channel1"] = frames[1][i].tolist()
+        result["channel2"] = frames[2][i].tolist()
+        result["channel3"] = frames[3][i].tolist()
+        stamp_capture(result, state, *frame_times[i])
+        if i < len(steps) - 1:
+            await asyncio.to_thread(
+                store_result, result, state, frontend, state.current_point
+            )
+
+    # the last frame goes through the normal path so the sweep advances as usual.
+    await asyncio.to_thread(get_result, result, state, frontend, instruments)
+
+
+async def capture_segmented(
+    instruments: lcd_instruments, state: lcd_state, steps: list[int]
+) -> tuple:
+    # one trigger per voltage into the scope's frame memory, with the output left
+    # on and only the amplitude changing between frames.
+    await instruments.oscilloscope.start_frame_recording(len(steps))
+    frame_times = []
+    for i, step in enumerate(steps):
+        state.sweep_step = step
+        state.series_progress = (i + 1, len(steps))
+        await instruments.agilent.set_voltage(state.current_point.values["voltage"])
+        # switched on only once the first amplitude is set, not at the last one used.
+        if i == 0:
+            await instruments.agilent.set_output("ON")
+        start = time.monotonic()
+        await instruments.oscilloscope.single_frame(trigger_timeout(state))
+        frame_times.append((start, time.monotonic()))
+    await instruments.agilent.set_output("OFF")
+
+    times, frames = await instruments.oscilloscope.get_recorded_frames(len(steps))
+    await instruments.oscilloscope.run()
+    return times, frames, frame_times
+
+
+async def run_ramp_acquisition(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
+) -> None:
+    while state.measurement_status == Status.RAMP_ACQUIRING:
+        for step in range(len(state.sweep)):
+            state.sweep_step = step
+            point = state.current_point
+
+            async def operation() -> dict:
+                await apply_point_settings(instruments, state)
+                return await acquire(instruments, state, point.values["voltage"])
+
+            try:
+                result = await supervise(
+                    operation,
+                    lambda: recover_instruments(instruments, state),
+                    deadline=capture_deadline(state),
+                    abort=lambda: abort_instruments(instruments),
+                )
+            except AcquisitionFailed as e:
+                # the stage keeps moving, so there is nothing to retry later.
+                await asyncio.to_thread(mark_failed, state, point, e)
+                continue
+
+            if state.measurement_status != Status.RAMP_ACQUIRING:
+                return
+
+            # the stage moves during the capture, so label the point with what it
+            # actually did rather than a nominal set point.
+            temperature = result["capture"]["temperature"]["mean"]
+            ramp_point = SweepPoint(
+                point.step,
+                (state.ramp_pass,) + point.index,
+                point.values | {"temperature": temperature},
+            )
+            labels = [f"{state.ramp_pass + 1}: {temperature:.2f}"] + state.sweep.labels(
+                point
+            )
 
+            parse_result(result, state, frontend)
+            await asyncio.to_thread(
+                store_result, result, state, frontend, ramp_point, labels
+            )
+
+        state.ramp_pass += 1
+        direction = 1 if state.ramp_end >= state.sweep.constants["temperature"] else -1
+        if (state.hotstage_temperature - state.ramp_end) * direction > -0.1:
+            state.measurement_status = Status.FINISHED
+
+
+async def start_hotstage_scheduler(
+    frontend: lcd_ui, instruments: lcd_instruments, state: lcd_state
+):
+    def record_sample(sample_time: float, temperature: float) -> None:
         state.hotstage_temperature = temperature
         dpg.set_value(frontend.hotstage_status, f"T: {temperature:.2f}")
-        state.T_log_time.append(log_time)
-        state.T_log_T.append(temperature)
+        state.telemetry.append(sample_time, temperature)
+        if state.monitor is not None:
+            state.monitor.publish_temperature(sample_time, temperature)
+
+    instruments.hotstage_scheduler.on_sample = record_sample
+    instruments.hotstage_scheduler.start()
 
-        if len(state.T_log_T) == 1000:
-            state.T_log_T = state.T_log_T[1:]
-            state.T_log_time = state.T_log_time[1:]
 
-        # state.hotstage_action = status
-        time.sleep(time_step)
-        log_time += time_step
+def selected_voltage(frontend: lcd_ui) -> float:
+    selected = dpg.get_value(frontend.volt_list.list_handle)
+    if not selected:
+        items = dpg.get_item_configuration(frontend.volt_list.list_handle)["items"]
+        if len(items) == 0:
+            raise ValueError("The voltage list is empty")
+        selected = items[0]
+    return float(selected.split("\t")[-1])
 
 
-def export_data_file(frontend: lcd_ui, state: lcd_state, result, single_shot=False):
+def measured_temperature(state: lcd_state, result: dict) -> float:
+    temperature = result.get("capture", {}).get("temperature", {}).get("mean")
+    if temperature is None or temperature != temperature:  # no telemetry yet
+        return state.hotstage_temperature
+    return temperature
+
+
+def export_data_file(
+    frontend: lcd_ui, state: lcd_state, result, single_shot=False, point=None
+):
+    times = result["time"]
+    channel1 = result["channel1"]
+    channel2 = result["channel2"]
+    channel3 = result["channel3"]
+
     if single_shot:
-        times = result["time"]
-        channel1 = result["channel1"]
-        channel2 = result["channel2"]
         output_filename = (
             dpg.get_value(frontend.output_file_path).split(".json")[0]
-            + f" {dpg.get_value(frontend.voltage_input):.2f} Volts"
+            + f" {selected_voltage(frontend):.2f} Volts"
             + f" {dpg.get_value(frontend.frequency_input):.1f} Hz"
-            + f" {state.hotstage_temperature:.2f} C.dat"
+            + f" {measured_temperature(state, result):.2f} C.dat"
         )
     else:
-        T_str = f"{state.T_step + 1}: {state.T_list[state.T_step]}"
-        v_str = f"{state.voltage_step + 1}: {state.voltage_list[state.voltage_step]}"
-        times = state.resultsDict[T_str][v_str]["time"]
-        channel1 = state.resultsDict[T_str][v_str]["channel1"]
-        channel2 = state.resultsDict[T_str][v_str]["channel2"]
-        channel3 = state.resultsDict[T_str][v_str]["channel3"]
-
+        values = (point or state.current_point).values
+        waveform = (
+            f" {values['waveform']}" if state.sweep.axis("waveform") is not None else ""
+        )
         output_filename = (
             dpg.get_value(frontend.output_file_path).split(".json")[0]
-            + f" {state.voltage_list[state.voltage_step]:.2f} Volts"
-            + f" {dpg.get_value(frontend.frequency_input):.1f} Hz"
-            + f" {state.T_list[state.T_step]:.2f} C.dat"
+            + f" {values['voltage']:.2f} Volts"
+            + f" {values['frequency']:.1f} Hz"
+            + waveform
+            + f" {values['temperature']:.2f} C.dat"
         )
 
     with open(output_filename, "w") as f:
@@ -349,6 +1143,86 @@ def export_data_file(frontend: lcd_ui, state: lcd_state, result, single_shot=Fal
         ):
             f.write(f"{time_inc}\t{channel1_inc}\t{channel2_inc}\t{channel3_inc}\n")
 
+    return output_filename
+
+
+# the generator settings in the panel, as a sweep point would carry them.
+def generator_values(frontend: lcd_ui) -> dict:
+    return {
+        "frequency": dpg.get_value(frontend.frequency_input),
+        "waveform": WAVEFORMS[dpg.get_value(frontend.selected_waveform)],
+        "user_shape": dpg.get_value(frontend.user_shape),
+        "pulse_width": dpg.get_value(frontend.pulse_width),
+    }
+
+
+def add_analysis(result: dict, state: lcd_state, values: dict) -> None:
+    from smponpol.hysteresis import LOOP_WAVEFORMS, loop_summary
+
+    frequency = values["frequency"]
+
+    if values.get("waveform") in LOOP_WAVEFORMS:
+        try:
+            result["hysteresis"] = loop_summary(
+                result,
+                state.acquisition.current_gain,
+                state.acquisition.electrode_area,
+            )
+            result["ps"] = result["hysteresis"]["ps"]
+        except ValueError as e:
+            print("No loop summary for this point: ", e)
+
+    if state.acquisition.harmonics > 0:
+        from smponpol.analysis import harmonics_result
+
+        result["harmonics"] = harmonics_result(
+            result,
+            frequency,
+            state.acquisition.harmonics,
+            state.acquisition.current_gain,
+        )
+
+    if state.acquisition.fold_cycles:
+        from smponpol.analysis import fold_result
+
+        result["folded"] = fold_result(
+            result, frequency, state.acquisition.phase_bins
+        )
+
+    if values.get("waveform") == "USER" and values.get("user_shape") == "PUND":
+        from smponpol.analysis import pund_result
+
+        result["pund"] = pund_result(
+            result,
+            frequency,
+            state.acquisition.phase_bins,
+            state.acquisition.current_gain,
+        )
+
+
+def store_result(
+    result: dict,
+    state: lcd_state,
+    frontend: lcd_ui,
+    point: SweepPoint,
+    labels: list | None = None,
+) -> None:
+    add_analysis(result, state, point.values)
+    state.results.add(point, result, labels)
+    output_file_path = dpg.get_value(frontend.output_file_path)
+    # write then rename, so a crash mid-write never leaves a truncated results.json.
+    with open(output_file_path + ".tmp", "w") as write_file:
+        json.dump(state.results.nested(), write_file, indent=4)
+    os.replace(output_file_path + ".tmp", output_file_path)
+
+    data_file = export_data_file(frontend, state, result, point=point)
+    labels = state.results.labels[point.index]
+    if state.journal is not None:
+        state.journal.record(point, labels, [data_file])
+    index_point(
+        state, state.run_id, point.step, labels, point.values, data_file, result
+    )
+
 
 def get_result(
     result: dict,
@@ -362,61 +1236,58 @@ def get_result(
     if state.measurement_status == Status.IDLE:
         pass
 
+    elif single_shot:
+        add_analysis(result, state, generator_values(frontend))
+        data_file = export_data_file(frontend, state, result, single_shot)
+        open_run_index(state)
+        values = {
+            "temperature": measured_temperature(state, result),
+            "voltage": selected_voltage(frontend),
+            "frequency": dpg.get_value(frontend.frequency_input),
+        }
+        index_point(state, None, None, [], values, data_file, result)
+        state.measurement_status = Status.IDLE
+        dpg.set_value(frontend.measurement_status, "Idle")
+
     else:
-        with open(dpg.get_value(frontend.output_file_path), "w") as write_file:
-            json.dump(state.resultsDict, write_file, indent=4)
+        store_result(result, state, frontend, state.current_point)
+        advance_sweep(state)
 
-        export_data_file(frontend, state, result, single_shot)
 
-        if single_shot:
-            state.measurement_status = Status.IDLE
-            dpg.set_value(frontend.measurement_status, "Idle")
-
-        if not single_shot:
-            if (
-                state.T_step == len(state.T_list) - 1
-                and state.voltage_step == len(state.voltage_list) - 1
-            ):
-                state.measurement_status = Status.FINISHED
-            elif state.voltage_step == len(state.voltage_list) - 1:
-                state.T_step += 1
-                T_str = f"{state.T_step + 1}: {state.T_list[state.T_step]}"
-                v_str = f"{state.voltage_step + 1}: {state.voltage_list[state.voltage_step]}"
-                state.resultsDict[T_str][v_str] = dict()
-                state.resultsDict[T_str][v_str]["time"] = []
-                state.resultsDict[T_str][v_str]["channel1"] = []
-                state.resultsDict[T_str][v_str]["channel2"] = []
-                state.resultsDict[T_str][v_str]["channel3"] = []
-
-                state.measurement_status = Status.SET_TEMPERATURE
+def mark_failed(state: lcd_state, point: SweepPoint, error: Exception) -> None:
+    print(f"Skipping point {point.step + 1}/{len(state.sweep)}: ", error)
+    state.failed_points[point.step] = str(error)
+    if state.journal is not None:
+        state.journal.record_failure(point, str(error))
 
-            else:
-                # state.T_step += 1
-                state.voltage_step += 1
-                T_str = f"{state.T_step + 1}: {state.T_list[state.T_step]}"
-                v_str = f"{state.voltage_step + 1}: {state.voltage_list[state.voltage_step]}"
 
-                state.resultsDict[T_str] = dict()
-                state.resultsDict[T_str][v_str] = dict()
-                state.resultsDict[T_str][v_str]["time"] = []
-                state.resultsDict[T_str][v_str]["channel1"] = []
-                state.resultsDict[T_str][v_str]["channel2"] = []
-                state.resultsDict[T_str][v_str]["channel3"] = []
+def skip_point(state: lcd_state, error: Exception) -> None:
+    mark_failed(state, state.current_point, error)
+    if state.measurement_status != Status.IDLE:
+        advance_sweep(state)
+
 
-                state.measurement_status = Status.TEMPERATURE_STABILISED
+def advance_sweep(state: lcd_state) -> None:
+    previous_step = state.sweep_step
+    next_step = previous_step + 1
+    # points completed before a resume are skipped.
+    while next_step < len(state.sweep) and state.sweep[next_step].index in state.results:
+        next_step += 1
+
+    if next_step == len(state.sweep):
+        state.measurement_status = Status.FINISHED
+    else:
+        state.sweep_step = next_step
+        # the hotstage only moves when the temperature axis advances.
+        if "temperature" in state.sweep.changed_axes(next_step, previous_step):
+            state.measurement_status = Status.SET_TEMPERATURE
+        else:
+            state.measurement_status = Status.TEMPERATURE_STABILISED
 
 
 def parse_result(
     result: dict, state: lcd_state, frontend: lcd_ui, single_shot=False
 ) -> None:
-    if not single_shot:
-        T_str = f"{state.T_step + 1}: {state.T_list[state.T_step]}"
-        v_str = f"{state.voltage_step + 1}: {state.voltage_list[state.voltage_step]}"
-        state.resultsDict[T_str][v_str]["time"] = result["time"]
-        state.resultsDict[T_str][v_str]["channel1"] = result["channel1"]
-        state.resultsDict[T_str][v_str]["channel2"] = result["channel2"]
-        state.resultsDict[T_str][v_str]["channel3"] = result["channel3"]
-
     dpg.set_value(frontend.results_plot, [result["time"], result["channel1"]])
     dpg.set_value(frontend.results_plot2, [result["time"], result["channel2"]])
     dpg.set_value(frontend.results_plot3, [result["time"], result["channel3"]])
@@ -424,3 +1295,15 @@ def parse_result(
     dpg.fit_axis_data("V_axis")
     dpg.fit_axis_data("time_axis")
     dpg.fit_axis_data("current_axis")
+
+    if single_shot:
+        voltage = selected_voltage(frontend)
+    else:
+        voltage = state.current_point.values["voltage"]
+    label = f"{measured_temperature(state, result):.2f} C, {voltage:.2f} V"
+    key = (None if single_shot else state.sweep_step, label)
+    state.trace_history.add(key, label, result)
+    frontend.draw_history(state.trace_history)
+
+    if state.monitor is not None:
+        state.monitor.publish_trace(None if single_shot else state.sweep_step, result)
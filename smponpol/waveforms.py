@@ -0,0 +1,79 @@
+import hashlib
+import re
+
+# 33220A arbitrary waveform memory: 14 bit DAC codes, 2 to 65536 points.
+DAC_MAX = 8191
+MAX_POINTS = 65536
+DEFAULT_POINTS = 4000
+DEFAULT_PULSE_WIDTH = 0.15
+
+# pulse amplitudes in order, each pulse followed by an equal rest at 0 V.
+PULSE_SHAPES = {
+    "PUND": [1, 1, -1, -1],
+    "Bipolar pulses": [1, -1],
+    "Positive pulses": [1, 1],
+    "Negative pulses": [-1, -1],
+}
+
+
+def pulse_train(
+    amplitudes: list[float],
+    pulse_width: float = DEFAULT_PULSE_WIDTH,
+    points: int = DEFAULT_POINTS,
+) -> "np.ndarray":
+    import numpy as np
+
+    # triangular pulses, `pulse_width` of the period each, evenly spaced.
+    if not 0 < pulse_width * len(amplitudes) <= 1:
+        raise ValueError(
+            f"{len(amplitudes)} pulses of width {pulse_width} do not fit in one period"
+        )
+    phase = (np.arange(points) + 0.5) / points
+    slot = 1.0 / len(amplitudes)
+    pulse = np.floor(phase / slot).astype(int)
+    position = (phase - pulse * slot) / pulse_width
+    shape = np.clip(1.0 - np.abs(2.0 * position - 1.0), 0.0, None)
+    shape[position >= 1.0] = 0.0
+    return np.asarray(amplitudes, dtype=float)[pulse] * shape
+
+
+# Positive-up-negative-down: the second pulse of each sign sees an already
+# switched sample, so subtracting it from the first leaves the switching current.
+def pund(
+    pulse_width: float = DEFAULT_PULSE_WIDTH, points: int = DEFAULT_POINTS
+) -> "np.ndarray":
+    return pulse_train(PULSE_SHAPES["PUND"], pulse_width, points)
+
+
+def user_waveform(
+    shape: str, pulse_width: float = DEFAULT_PULSE_WIDTH, points: int = DEFAULT_POINTS
+) -> "np.ndarray":
+    amplitudes = PULSE_SHAPES[shape]
+    # pulses wider than their slot would run into each other, so they touch instead.
+    pulse_width = min(pulse_width, 1.0 / len(amplitudes))
+    return to_dac(pulse_train(amplitudes, pulse_width, points))
+
+
+def to_dac(waveform: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    waveform = np.asarray(waveform, dtype=float)
+    if not 2 <= len(waveform) <= MAX_POINTS:
+        raise ValueError(f"arbitrary waveforms need 2 to {MAX_POINTS} points")
+    peak = np.max(np.abs(waveform))
+    if peak > 0:
+        waveform = waveform / peak
+    return np.round(waveform * DAC_MAX).astype("<i2")
+
+
+def waveform_name(dac: "np.ndarray") -> str:
+    import numpy as np
+
+    # arb names are at most 12 characters and must start with a letter.
+    digest = hashlib.sha1(np.ascontiguousarray(dac).tobytes()).hexdigest()
+    return "ARB" + digest[:9].upper()
+
+
+def is_generated_name(name: str) -> bool:
+    # shapes stored by waveform_name; anything else was saved by someone else.
+    return re.fullmatch("ARB[0-9A-F]{9}", name) is not None
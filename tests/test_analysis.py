@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+
+from smponpol.analysis import (
+    demodulate,
+    fold_cycles,
+    fold_result,
+    harmonics_result,
+    pund_switching,
+)
+from smponpol.waveforms import pulse_train
+
+FREQUENCY = 1000.0
+
+
+def periods(count: float, samples_per_period: int = 1000) -> np.ndarray:
+    return np.arange(int(count * samples_per_period)) / (
+        samples_per_period * FREQUENCY
+    )
+
+
+def test_fold_cycles_averages_whole_periods():
+    times = periods(4.5)
+    rng = np.random.default_rng(0)
+    signal = np.sin(2 * np.pi * FREQUENCY * times)
+    noisy = signal + rng.normal(0, 0.1, len(times))
+
+    folded = fold_cycles(times, [signal, noisy], FREQUENCY, bins=100)
+    assert folded["cycles"] == 4
+    assert folded["mean"].shape == (2, 100)
+    expected = np.sin(2 * np.pi * folded["phase"])
+    assert np.allclose(folded["mean"][0], expected, atol=0.02)
+    assert np.allclose(folded["mean"][1], expected, atol=0.1)
+    assert np.all(folded["error"][1] > 0)
+
+
+def test_fold_cycles_counts_periods_from_the_trigger():
+    # half a period before the trigger is dropped, so the phase is kept.
+    times = periods(5) - 0.5 / FREQUENCY
+    signal = np.sin(2 * np.pi * FREQUENCY * times)
+    folded = fold_cycles(times, signal, FREQUENCY, bins=50)
+    assert folded["cycles"] == 4
+    assert np.allclose(folded["mean"][0], np.sin(2 * np.pi * folded["phase"]), atol=0.1)
+
+
+def test_fold_cycles_needs_a_whole_period():
+    times = periods(0.8)
+    assert fold_cycles(times, np.zeros_like(times), FREQUENCY) is None
+
+
+def test_fold_result_leaves_empty_bins_empty():
+    # more bins than samples per period, so some bins never get a sample.
+    times = periods(2.5, 100)
+    result = {
+        "time": times,
+        "channel1": np.sin(2 * np.pi * FREQUENCY * times),
+        "channel2": np.zeros_like(times),
+        "channel3": np.zeros_like(times),
+    }
+    folded = fold_result(result, FREQUENCY, bins=256)
+    assert folded["cycles"] == 2
+    assert None in folded["channel1"]
+    json.dumps(folded, allow_nan=False)
+
+
+def test_pund_switching_subtracts_the_second_pulse():
+    times = periods(3, 4000)
+    phase = (times * FREQUENCY) % 1.0
+    shape = pulse_train([2.0, 1.0, -2.0, -1.0], 0.2, 4000)
+    current = shape[np.minimum((phase * 4000).astype(int), 3999)]
+
+    switching = pund_switching(times, current, FREQUENCY, bins=400)
+    assert switching["cycles"] == 2
+    assert len(switching["phase"]) == 100
+    assert np.isclose(switching["positive"].max(), 1.0, atol=0.05)
+    assert np.isclose(switching["negative"].min(), -1.0, atol=0.05)
+
+
+def test_demodulate_recovers_amplitude_and_phase():
+    times = periods(4.2)
+    omega = 2 * np.pi * FREQUENCY
+    data = [
+        2.0 * np.cos(omega * times + 0.3) + 0.5 * np.cos(3 * omega * times - 1.0) + 1.0,
+        np.sin(omega * times),
+    ]
+
+    demodulated = demodulate(times, data, FREQUENCY, harmonics=3)
+    assert demodulated["cycles"] == 4
+    assert list(demodulated["orders"]) == [1, 2, 3]
+    amplitudes = demodulated["amplitudes"]
+    assert np.isclose(amplitudes[0, 0], 2.0 * np.exp(0.3j), atol=1e-3)
+    assert np.isclose(amplitudes[0, 1], 0, atol=1e-3)
+    assert np.isclose(amplitudes[0, 2], 0.5 * np.exp(-1.0j), atol=1e-3)
+    assert np.isclose(amplitudes[1, 0], np.exp(-0.5j * np.pi), atol=1e-3)
+
+
+def test_demodulate_needs_a_whole_period():
+    times = periods(0.5)
+    assert demodulate(times, np.zeros_like(times), FREQUENCY) is None
+
+
+def test_harmonics_result_without_reactive_current():
+    times = periods(4.2)
+    drive = np.cos(2 * np.pi * FREQUENCY * times)
+    # a resistive sample: the current is in phase with the drive.
+    result = {"time": times, "channel1": drive, "channel2": 0.5 * drive}
+    result["channel3"] = np.zeros_like(times)
+    harmonics = harmonics_result(result, FREQUENCY, current_gain=2.0)
+    assert harmonics["conductance"] == pytest.approx(1.0, rel=1e-3)
+    assert harmonics["capacitance"] == pytest.approx(0.0, abs=1e-9)
+    assert harmonics["channel2"]["in_phase"][0] == pytest.approx(0.5, rel=1e-3)
+    json.dumps(harmonics, allow_nan=False)
+
+
+def test_loss_tangent_is_left_out_without_a_reactive_part():
+    times = periods(4)
+    drive = np.cos(2 * np.pi * FREQUENCY * times)
+    result = {
+        "time": times,
+        "channel1": drive,
+        "channel2": np.zeros_like(times),
+        "channel3": np.zeros_like(times),
+    }
+    harmonics = harmonics_result(result, FREQUENCY)
+    assert harmonics["loss_tangent"] is None
+    json.dumps(harmonics, allow_nan=False)
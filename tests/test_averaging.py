@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from smponpol.averaging import (
+    StreamingAverage,
+    repeats_needed,
+    sample_noise,
+    scope_average_count,
+)
+
+
+def test_streaming_average_matches_numpy():
+    rng = np.random.default_rng(0)
+    traces = rng.normal(0, 1, (20, 50))
+    average = StreamingAverage()
+    for trace in traces:
+        average.add(trace)
+
+    assert average.count == 20
+    assert np.allclose(average.mean, traces.mean(axis=0))
+    assert np.allclose(average.variance, traces.var(axis=0, ddof=1))
+    assert np.allclose(average.standard_error, traces.std(axis=0, ddof=1) / np.sqrt(20))
+    assert average.noise() == pytest.approx(
+        np.sqrt(np.mean(traces.var(axis=0, ddof=1) / 20))
+    )
+
+
+def test_single_trace_has_no_error_estimate():
+    average = StreamingAverage()
+    average.add([1.0, 2.0])
+    assert np.all(np.isinf(average.variance))
+
+
+def test_sample_noise_ignores_the_signal():
+    rng = np.random.default_rng(1)
+    times = np.linspace(0, 1, 20000)
+    signal = np.sign(np.sin(2 * np.pi * 5 * times)) + np.sin(2 * np.pi * 3 * times)
+    noise = rng.normal(0, 0.01, len(times))
+    assert sample_noise(signal + noise) == pytest.approx(0.01, rel=0.05)
+
+
+@pytest.mark.parametrize(
+    "error, target, cap, expected",
+    [
+        (2.0, 1.0, 100, 4),
+        (2.5, 1.0, 100, 7),
+        (0.1, 1.0, 100, 1),
+        (100.0, 1.0, 100, 100),
+        (1.0, 0.0, 50, 50),
+        (float("inf"), 1.0, 50, 50),
+        (float("nan"), 1.0, 50, 50),
+    ],
+)
+def test_repeats_needed(error, target, cap, expected):
+    assert repeats_needed(error, target, cap) == expected
+
+
+@pytest.mark.parametrize(
+    "repeats, cap, expected",
+    [(1, 64, 2), (3, 64, 4), (64, 64, 64), (100, 64, 64), (10000, 8192, 8192), (1, 1, 2)],
+)
+def test_scope_average_count(repeats, cap, expected):
+    assert scope_average_count(repeats, cap) == expected
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+
+from smponpol.batch import (
+    MANIFEST,
+    excel_layout,
+    iter_points,
+    load_manifest,
+    read_input,
+    run_batch,
+)
+
+
+def make_trace(scale: float = 1.0) -> dict:
+    times = np.arange(2000) / 1e6 - 2.5e-4
+    return {
+        "time": times.tolist(),
+        "channel1": (scale * np.sin(2 * np.pi * 1000 * times)).tolist(),
+        "channel2": (scale * np.cos(2 * np.pi * 1000 * times)).tolist(),
+        "channel3": np.zeros_like(times).tolist(),
+    }
+
+
+def write_dat(path, trace: dict) -> None:
+    rows = zip(*(trace[name] for name in ("time", "channel1", "channel2", "channel3")))
+    with open(path, "w") as f:
+        f.write("time\tchannel1\tchannel2\tchannel3\nData\n")
+        for row in rows:
+            f.write("\t".join(str(value) for value in row) + "\n")
+
+
+def test_iter_points_walks_every_level():
+    trace = make_trace()
+    results = {"1: 25.0": {"1: 1.0": trace, "2: 2.0": trace}, "2: 30.0": {}}
+    assert [labels for labels, _ in iter_points(results)] == [
+        ("1: 25.0", "1: 1.0"),
+        ("1: 25.0", "2: 2.0"),
+    ]
+
+
+def test_excel_layout_only_takes_temperature_and_voltage():
+    trace = make_trace() | {"ps": 1.0}
+    layout = excel_layout({"1: 25.0": {"1: 1.0": trace}})
+    assert list(layout["1: 25.0"]["1: 1.0"]) == [
+        "time",
+        "channel1",
+        "channel2",
+        "channel3",
+    ]
+    assert excel_layout({"1: 25.0": {"1: 1000.0": {"1: 1.0": trace}}}) is None
+
+
+def test_read_input(tmp_path):
+    results = tmp_path / "results.json"
+    results.write_text(json.dumps({"1: 25.0": {"1: 1.0": make_trace()}}))
+    ((label, trace),) = read_input(results)
+    assert label == "1: 25.0 / 1: 1.0"
+    assert len(trace["channel1"]) == 2000
+
+    write_dat(tmp_path / "point.dat", make_trace())
+    ((label, trace),) = read_input(tmp_path / "point.dat")
+    assert label == "point"
+    assert np.allclose(trace["channel2"], make_trace()["channel2"])
+
+
+def test_load_manifest_stops_at_a_cut_short_line(tmp_path):
+    path = tmp_path / MANIFEST
+    path.write_text('{"path": "a.dat", "size": 1}\n{"path": "b.d')
+    assert list(load_manifest(path)) == ["a.dat"]
+    assert load_manifest(tmp_path / "missing.jsonl") == {}
+
+
+def test_batch_resumes_and_redoes_changed_files(tmp_path, capsys):
+    root = tmp_path / "runs"
+    root.mkdir()
+    write_dat(root / "a.dat", make_trace())
+    (root / "results.json").write_text(
+        json.dumps({"1: 25.0": {"1: 1.0": make_trace(), "2: 2.0": make_trace(2.0)}})
+    )
+    output = root / "processed"
+
+    run_batch(root, output, ["dat", "json"], processes=1)
+    assert "2 files to process" in capsys.readouterr().out
+    assert (output / "a.dat.npz").exists()
+    with np.load(output / "results.json.npz") as archive:
+        assert list(archive["labels"]) == ["1: 25.0 / 1: 1.0", "1: 25.0 / 2: 2.0"]
+    summary = (output / "summary.csv").read_text().splitlines()
+    assert len(summary) == 4
+
+    # nothing changed, so nothing is converted again.
+    run_batch(root, output, ["dat", "json"], processes=1)
+    assert "0 files to process" in capsys.readouterr().out
+
+    write_dat(root / "a.dat", make_trace(3.0))
+    stat = os.stat(root / "a.dat")
+    os.utime(root / "a.dat", (stat.st_atime, stat.st_mtime + 10))
+    run_batch(root, output, ["dat", "json"], processes=1)
+    assert "1 files to process" in capsys.readouterr().out
+    assert len(load_manifest(output / MANIFEST)) == 2
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from smponpol.browser import TraceReader, load_data_file, neighbours
+
+
+def write_trace(path, offset: float = 0.0) -> str:
+    path.write_text(
+        "time\tchannel1\tchannel2\tchannel3\nData\n"
+        f"0.0\t{offset + 1}\t2.0\t3.0\n1e-6\t-1\t-2\t-3\n"
+    )
+    return str(path)
+
+
+def test_load_data_file(tmp_path):
+    trace = load_data_file(write_trace(tmp_path / "point.dat"))
+    assert np.array_equal(trace["time"], [0.0, 1e-6])
+    assert np.array_equal(trace["channel1"], [1.0, -1.0])
+    assert np.array_equal(trace["channel3"], [3.0, -3.0])
+
+
+def test_single_row_file(tmp_path):
+    path = tmp_path / "point.dat"
+    path.write_text("time\tchannel1\tchannel2\tchannel3\nData\n0.0\t1\t2\t3\n")
+    assert load_data_file(str(path))["channel2"].tolist() == [2.0]
+
+
+def test_reader_caches_the_most_recent_files(tmp_path):
+    paths = [write_trace(tmp_path / f"{i}.dat", i) for i in range(3)]
+    reader = TraceReader(cache_size=2)
+    first = reader.load(paths[0])
+    assert reader.load(paths[0]) is first
+    reader.load(paths[1])
+    reader.load(paths[2])
+    assert list(reader.cache) == paths[1:]
+    assert reader.load(paths[0]) is not first
+
+
+def test_prefetched_files_are_already_loaded(tmp_path):
+    paths = [write_trace(tmp_path / f"{i}.dat", i) for i in range(4)]
+    reader = TraceReader()
+    reader.prefetch(paths[1:])
+    reader.executor.shutdown(wait=True)
+    assert set(reader.cache) == set(paths[1:])
+    assert reader.load(paths[3])["channel1"][0] == 4.0
+
+
+@pytest.mark.parametrize(
+    "index, count, expected",
+    [
+        (5, 10, [6, 4, 7, 3, 8, 2]),
+        (0, 10, [1, 2, 3]),
+        (9, 10, [8, 7, 6]),
+        (0, 1, []),
+    ],
+)
+def test_neighbours_nearest_first(index, count, expected):
+    assert neighbours(index, count) == expected
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from smponpol import hotstage_scheduler
+from smponpol.hotstage_scheduler import (
+    FAST_PERIOD,
+    IDLE_PERIOD,
+    MAX_BACKOFF,
+    HotstageScheduler,
+)
+
+
+class FakeHotstage:
+    def __init__(self, temperatures=()) -> None:
+        self.temperatures = list(temperatures)
+        self.calls = []
+        self.released = asyncio.Event()
+        self.released.set()
+
+    async def get_temperature(self):
+        await self.released.wait()
+        if not self.temperatures:
+            return None
+        temperature = self.temperatures.pop(0)
+        if isinstance(temperature, Exception):
+            raise temperature
+        return temperature
+
+    async def ramp(self, T, rate):
+        self.calls.append(("ramp", T, rate))
+
+    async def hold(self, T):
+        self.calls.append(("hold", T))
+
+    async def stop(self):
+        self.calls.append(("stop",))
+
+
+def test_poll_period_speeds_up_and_backs_off():
+    scheduler = HotstageScheduler(FakeHotstage())
+    assert scheduler.poll_period() == IDLE_PERIOD
+    scheduler.target = 30.0
+    assert scheduler.poll_period() == FAST_PERIOD
+    scheduler.failures = 2
+    assert scheduler.poll_period() == FAST_PERIOD * 4
+    scheduler.failures = 20
+    assert scheduler.poll_period() == MAX_BACKOFF
+
+
+def test_stop_runs_before_commands_queued_ahead_of_it():
+    async def main():
+        hotstage = FakeHotstage([25.0] * 10)
+        hotstage.released.clear()
+        scheduler = HotstageScheduler(hotstage)
+        scheduler.start()
+        # the first poll is held up while the commands queue behind it.
+        await asyncio.sleep(0)
+        commands = [
+            asyncio.create_task(scheduler.ramp(40.0, 5.0)),
+            asyncio.create_task(scheduler.hold(30.0)),
+            asyncio.create_task(scheduler.stop()),
+        ]
+        await asyncio.sleep(0)
+        hotstage.released.set()
+        await asyncio.gather(*commands)
+        scheduler.close()
+        return hotstage.calls
+
+    assert asyncio.run(main()) == [("stop",), ("ramp", 40.0, 5.0), ("hold", 30.0)]
+
+
+def test_poll_errors_back_off_without_ending_the_loop(monkeypatch):
+    monkeypatch.setattr(hotstage_scheduler, "IDLE_PERIOD", 0.001)
+    monkeypatch.setattr(hotstage_scheduler, "MAX_BACKOFF", 0.001)
+
+    async def main():
+        hotstage = FakeHotstage([OSError("link dropped"), None, 25.0, 25.0])
+        samples = []
+        scheduler = HotstageScheduler(hotstage, lambda *sample: samples.append(sample))
+        await scheduler.poll()
+        await scheduler.poll()
+        assert scheduler.failures == 2
+        scheduler.start()
+        while len(samples) < 2:
+            await asyncio.sleep(0.001)
+        scheduler.close()
+        return scheduler, samples
+
+    scheduler, samples = asyncio.run(main())
+    assert scheduler.failures == 0
+    assert [temperature for _, temperature in samples] == [25.0, 25.0]
+
+
+def test_target_is_cleared_once_the_stage_settles_on_it():
+    async def main():
+        scheduler = HotstageScheduler(FakeHotstage([29.0, 29.95, 29.96]))
+        scheduler.target = 30.0
+        states = []
+        for _ in range(3):
+            await scheduler.poll()
+            states.append((scheduler.target, scheduler.moving))
+        return states
+
+    assert asyncio.run(main()) == [(30.0, False), (30.0, True), (None, False)]
+
+
+def test_commands_fail_when_the_scheduler_stops():
+    async def main():
+        scheduler = HotstageScheduler(FakeHotstage())
+        pending = asyncio.create_task(scheduler.hold(30.0))
+        await asyncio.sleep(0)
+        # never started, so the queued hold cannot reach the stage.
+        await scheduler.stop()
+        return await asyncio.gather(pending, return_exceptions=True)
+
+    (error,) = asyncio.run(main())
+    assert isinstance(error, RuntimeError)
+
+
+def test_command_errors_reach_the_caller():
+    class FailingHotstage(FakeHotstage):
+        async def hold(self, T):
+            raise OSError("no reply")
+
+    async def main():
+        scheduler = HotstageScheduler(FailingHotstage([25.0] * 10))
+        scheduler.start()
+        try:
+            with pytest.raises(OSError):
+                await scheduler.hold(30.0)
+            # the loop carries on after a failed command.
+            await scheduler.ramp(40.0, 1.0)
+        finally:
+            scheduler.close()
+        return scheduler.hotstage.calls
+
+    assert asyncio.run(main()) == [("ramp", 40.0, 1.0)]
@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pytest
+
+from smponpol.hysteresis import (
+    BRIDGE_RANGE_STD,
+    analyse_run,
+    hysteresis_loops,
+    loop_summary,
+    ps_uncertainty,
+)
+
+FREQUENCY = 1000.0
+PS = 2.0  # uC/cm^2
+VC = 0.4  # V
+
+
+def square_loop(cycles: int = 3, samples_per_period: int = 2000):
+    # a switching loop: P follows a narrow tanh that shifts by +-Vc with the sweep
+    # direction, and the monitor sees dP/dt. The record holds whole periods from a
+    # quarter period before the trigger, so every rising 0 V crossing is inside it.
+    times = np.arange(cycles * samples_per_period) / (
+        samples_per_period * FREQUENCY
+    ) - 0.25 / FREQUENCY
+    voltage = np.sin(2 * np.pi * FREQUENCY * times)
+    rising = np.cos(2 * np.pi * FREQUENCY * times) >= 0
+    polarisation = PS * np.tanh((voltage - np.where(rising, VC, -VC)) / 0.02)
+    current = np.gradient(polarisation * 1e-6, times)
+    return times, voltage, current
+
+
+def test_square_loop():
+    times, voltage, current = square_loop()
+    loops = hysteresis_loops(times, voltage, current)
+    assert loops["polarisation"].shape == (1, len(times))
+    assert loops["ps"][0] == pytest.approx(PS, rel=0.02)
+    assert loops["pr"][0] == pytest.approx(PS, rel=0.02)
+    assert loops["vc"][0] == pytest.approx(VC, rel=0.05)
+    assert loops["cycles"][0] == 3
+    # a square loop encloses about 2 Ps x 2 Vc per cycle.
+    assert loops["loop_area"][0] == pytest.approx(4 * PS * VC, rel=0.1)
+
+
+def test_gain_and_area_scale_polarisation():
+    times, voltage, current = square_loop()
+    loops = hysteresis_loops(times, voltage, current, current_gain=2.0, area=0.5)
+    assert loops["ps"][0] == pytest.approx(4 * PS, rel=0.02)
+    assert loops["vc"][0] == pytest.approx(VC, rel=0.05)
+
+
+def test_area_must_be_positive():
+    times, voltage, current = square_loop()
+    with pytest.raises(ValueError):
+        hysteresis_loops(times, voltage, current, area=0)
+
+
+def test_loop_summary_leaves_missing_values_empty():
+    times = np.linspace(0, 1e-3, 1000)
+    result = {
+        "time": times,
+        "channel1": np.ones_like(times),
+        "channel2": np.zeros_like(times),
+    }
+    summary = loop_summary(result)
+    assert summary["pr"] is None
+    assert summary["vc"] is None
+    assert summary["cycles"] == 0
+    json.dumps(summary, allow_nan=False)
+
+
+def test_analyse_run_matches_single_points():
+    times, voltage, current = square_loop()
+    short = square_loop(cycles=2)
+    traces = [
+        {"time": times, "channel1": voltage, "channel2": current},
+        {"time": times, "channel1": voltage, "channel2": 0.5 * current},
+        {"time": short[0], "channel1": short[1], "channel2": short[2]},
+    ]
+    summary = analyse_run(traces, chunk=1)
+    for i, trace in enumerate(traces):
+        expected = loop_summary(trace)
+        for name, value in expected.items():
+            assert summary[name][i] == pytest.approx(value)
+
+
+def test_ps_uncertainty_follows_the_noise():
+    times, voltage, current = square_loop(cycles=4)
+    sigma = 1e-4
+    rng = np.random.default_rng(1)
+    noisy = current + rng.normal(0, sigma, len(current))
+
+    ps, error = ps_uncertainty(times, voltage, noisy)
+    dt = times[1] - times[0]
+    expected = BRIDGE_RANGE_STD / 2 * sigma * dt * np.sqrt(len(times)) * 1e6
+    assert ps == pytest.approx(PS, rel=0.05)
+    assert error == pytest.approx(expected, rel=0.15)
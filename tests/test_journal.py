@@ -0,0 +1,59 @@
+import pytest
+
+from smponpol.journal import SweepJournal
+from smponpol.sweep import SweepAxis, SweepPlan
+
+
+def make_plan() -> SweepPlan:
+    return SweepPlan(
+        [SweepAxis("temperature", [25.0, 30.0]), SweepAxis("voltage", [1.0, 2.0])]
+    )
+
+
+def test_path_for():
+    assert SweepJournal.path_for("run/results.json") == "run/results.journal"
+
+
+def test_load_returns_plan_settings_and_completed_points(tmp_path):
+    plan = make_plan()
+    journal = SweepJournal(str(tmp_path / "results.journal"))
+    journal.start(plan, {"frequency": 1000.0})
+    journal.record(plan[0], ["1: 25.0", "1: 1.0"], ["point0.txt"])
+    journal.record_failure(plan[1], "no trigger")
+    journal.record(plan[2], ["2: 30.0", "1: 1.0"], ["point2.txt"])
+
+    loaded, settings, completed = journal.load()
+    assert loaded.to_dict() == plan.to_dict()
+    assert settings == {"frequency": 1000.0}
+    # the failed point is measured again on resume.
+    assert sorted(completed) == [(0, 0), (1, 0)]
+    assert completed[(1, 0)]["files"] == ["point2.txt"]
+
+
+def test_start_replaces_an_old_journal(tmp_path):
+    plan = make_plan()
+    journal = SweepJournal(str(tmp_path / "results.journal"))
+    journal.start(plan, {})
+    journal.record(plan[0], [], [])
+    journal.start(plan, {})
+    assert journal.load()[2] == {}
+
+
+def test_line_cut_short_by_a_crash_is_ignored(tmp_path):
+    plan = make_plan()
+    path = tmp_path / "results.journal"
+    journal = SweepJournal(str(path))
+    journal.start(plan, {})
+    journal.record(plan[0], [], [])
+    with open(path, "a") as f:
+        f.write('{"type": "point", "step": 1, "ind')
+
+    assert list(journal.load()[2]) == [(0, 0)]
+
+
+def test_journal_without_plan_is_rejected(tmp_path):
+    path = tmp_path / "results.journal"
+    path.write_text("")
+    with pytest.raises(ValueError):
+        SweepJournal(str(path)).load()
+
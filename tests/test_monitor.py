@@ -0,0 +1,115 @@
+import asyncio
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from smponpol import monitor
+from smponpol.monitor import (
+    BINARY,
+    MAX_TRACE_POINTS,
+    TEXT,
+    MonitorServer,
+    decode_trace,
+    encode_frame,
+    encode_trace,
+    read_frame,
+)
+
+
+def read(data: bytes) -> tuple[int, bytes]:
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("length", [0, 125, 126, 2**16 - 1, 2**16])
+def test_frames_round_trip_at_every_length_encoding(length):
+    payload = bytes(i % 251 for i in range(length))
+    assert read(encode_frame(payload, BINARY)) == (BINARY, payload)
+
+
+def test_masked_client_frames_are_unmasked():
+    payload = b'{"type": "close"}'
+    mask = bytes([1, 2, 3, 4])
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    frame = struct.pack("!BB", 0x80 | TEXT, 0x80 | len(payload)) + mask + masked
+    assert read(frame) == (TEXT, payload)
+
+
+def test_traces_round_trip():
+    times = np.linspace(0, 1e-3, 500)
+    result = {
+        "time": times,
+        "channel1": np.sin(times),
+        "channel2": np.cos(times),
+        "channel3": times * 2,
+    }
+    step, data = decode_trace(encode_trace(7, result))
+    assert step == 7
+    assert data.shape == (4, 500)
+    assert np.allclose(data[2], np.cos(times), atol=1e-6)
+
+
+def test_long_traces_are_decimated():
+    points = 10 * MAX_TRACE_POINTS + 1
+    result = {
+        name: np.arange(points, dtype=float)
+        for name in ("time", "channel1", "channel2", "channel3")
+    }
+    step, data = decode_trace(encode_trace(None, result))
+    assert step == -1
+    assert data.shape[1] <= MAX_TRACE_POINTS
+    assert data[0][0] == 0.0
+    assert data[0][1] == 11.0
+
+
+def test_status_endpoint():
+    async def main():
+        server = MonitorServer(port=0)
+        await server.start()
+        server.publish_status("Running", 3)
+        port = server.server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /status HTTP/1.1\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        await server.close()
+        return response
+
+    head, _, body = asyncio.run(main()).partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert json.loads(body) == {"status": "Running", "temperature": None, "step": 3}
+
+
+def test_viewer_that_stops_reading_is_dropped(monkeypatch):
+    monkeypatch.setattr(monitor, "DRAIN_TIMEOUT", 0.2)
+
+    async def main():
+        server = MonitorServer(port=0)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            b"GET /stream HTTP/1.1\r\nSec-WebSocket-Key: dGhlIHNhbXBsZQ==\r\n\r\n"
+        )
+        while not server.clients:
+            await asyncio.sleep(0.01)
+        # the viewer never reads, so the socket buffers fill up.
+        frame = encode_frame(bytes(1_000_000), BINARY)
+        for _ in range(200):
+            if not server.clients:
+                break
+            server.broadcast(frame)
+            await asyncio.sleep(0.02)
+        dropped = not server.clients
+        writer.close()
+        await server.close()
+        return dropped
+
+    assert asyncio.run(main())
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from smponpol.ranging import (
+    MAX_SCALE,
+    MIN_SCALE,
+    is_clipped,
+    next_range,
+    nice_scale,
+    plan_range,
+)
+
+
+@pytest.mark.parametrize(
+    "scale, expected",
+    [(0.3, 0.5), (0.5, 0.5), (0.11, 0.2), (0.02, 0.02), (1.01, 2.0), (6.0, 10.0)],
+)
+def test_nice_scale_rounds_up_to_a_step(scale, expected):
+    assert nice_scale(scale) == pytest.approx(min(expected, MAX_SCALE))
+
+
+def test_nice_scale_stays_within_the_scope_limits():
+    assert nice_scale(1e-6) == MIN_SCALE
+    assert nice_scale(100.0) == MAX_SCALE
+
+
+def test_plan_range_centres_the_trace():
+    scale, offset = plan_range(-1.0, 1.0)
+    # 2 V over 8 divisions with 20 % headroom is 0.3125 V/div.
+    assert scale == pytest.approx(0.5)
+    assert offset == 0.0
+    assert math.copysign(1.0, offset) == 1.0
+
+    scale, offset = plan_range(1.0, 3.0)
+    assert offset == pytest.approx(-2.0)
+
+
+def test_is_clipped():
+    data = np.array([-1.0, 1.0])
+    assert not is_clipped(data, 0.5, 0.0)
+    assert is_clipped(data, 0.25, 0.0)
+    # with the screen moved up, the bottom edge is at -0.5 V.
+    assert is_clipped(data, 0.25, -1.5)
+
+
+def test_next_range_follows_an_unclipped_trace():
+    data = np.array([-0.1, 0.3])
+    assert next_range(data, 1.0, 0.0) == plan_range(-0.1, 0.3)
+
+
+def test_next_range_widens_a_clipped_trace():
+    data = np.array([-1.0, 1.0])
+    scale, offset = next_range(data, 0.25, 0.0)
+    # the screen showed +-1 V, so the next one must show at least twice that.
+    assert scale * 4 >= 2.0
+    assert offset == 0.0
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from smponpol.run_index import RunIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RunIndex(tmp_path / "index" / "runs.sqlite")
+    yield index
+    index.close()
+
+
+def add(index, tmp_path, run_id, step, **values):
+    path = tmp_path / f"{run_id}-{step}.txt"
+    path.write_text("data")
+    index.add_point(run_id, step, [str(step)], values, str(path), ps=1.5)
+
+
+def test_runs_and_points(index, tmp_path):
+    run_id = index.start_run("results.json", {"frequency": 1000.0})
+    add(index, tmp_path, run_id, 1, voltage=2.0)
+    add(index, tmp_path, run_id, 0, voltage=1.0)
+
+    (run,) = index.runs()
+    assert run["run_id"] == run_id
+    assert json.loads(run["settings"]) == {"frequency": 1000.0}
+
+    points = index.points(run_id)
+    assert [point["step"] for point in points] == [0, 1]
+    assert points[0]["file_length"] == 4
+    assert points[0]["ps"] == 1.5
+    assert json.loads(points[1]["labels"]) == ["1"]
+
+
+def test_query_filters(index, tmp_path):
+    first = index.start_run("a.json", {})
+    second = index.start_run("b.json", {})
+    add(index, tmp_path, first, 0, temperature=25.0, voltage=1.0, frequency=1000.0)
+    add(index, tmp_path, first, 1, temperature=40.0, voltage=1.0, frequency=1000.0)
+    add(
+        index,
+        tmp_path,
+        second,
+        0,
+        temperature=30.0,
+        voltage=2.0,
+        frequency=500.0,
+        waveform="SIN",
+    )
+
+    assert len(index.query()) == 3
+    assert len(index.query(run_id=first)) == 2
+    assert len(index.query(frequency=1000.0)) == 2
+    assert len(index.query(voltage=2.0)) == 1
+    assert len(index.query(waveform="SIN")) == 1
+    rows = index.query(t_min=26.0, t_max=35.0)
+    assert [row["temperature"] for row in rows] == [30.0]
+    assert index.query(since=rows[0]["recorded"] + 1) == []
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from pyvisa import constants
+from pyvisa.errors import InvalidSession, VisaIOError
+
+from smponpol import session
+from smponpol.session import InstrumentAborted, VisaSession
+
+
+class FakeResource:
+    def __init__(self, manager) -> None:
+        self.manager = manager
+        self.closed = False
+        self.timeout = None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def query(self, message: str) -> str:
+        if self.closed:
+            raise InvalidSession()
+        if self.manager.io_errors > 0:
+            self.manager.io_errors -= 1
+            raise VisaIOError(constants.VI_ERROR_TMO)
+        return f"reply to {message}"
+
+
+class FakeResourceManager:
+    def __init__(self) -> None:
+        self.io_errors = 0  # queries that time out before one gets through
+        self.open_errors = 0  # opens that fail before the device is back
+        self.opened = []
+
+    def open_resource(self, address: str) -> FakeResource:
+        if self.open_errors > 0:
+            self.open_errors -= 1
+            raise VisaIOError(constants.VI_ERROR_RSRC_NFOUND)
+        resource = FakeResource(self)
+        self.opened.append(resource)
+        return resource
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(session, "RETRY_BACKOFF", 0)
+    manager = FakeResourceManager()
+    visa = VisaSession()
+    visa._resource_manager = manager
+    manager.visa = visa
+    return manager
+
+
+def test_settings_are_applied_and_handles_pooled(manager):
+    handle = manager.visa.open("USB::1", timeout=1000)
+    assert manager.visa.open("USB::1", timeout=2000) is handle
+    assert handle.resource.timeout == 2000
+    assert len(manager.opened) == 1
+
+
+def test_io_error_reconnects_and_repeats_the_exchange(manager):
+    handle = manager.visa.open("USB::1", timeout=1000)
+    manager.io_errors = 1
+    assert handle.query("*IDN?") == "reply to *IDN?"
+    assert len(manager.opened) == 2
+    assert manager.opened[0].closed
+    # the fresh link gets the same settings as the old one.
+    assert handle.resource.timeout == 1000
+
+
+def test_failed_reopen_is_retried_on_the_next_attempt(manager):
+    handle = manager.visa.open("USB::1")
+    manager.io_errors = 1
+    manager.open_errors = 1
+    assert handle.query("*IDN?") == "reply to *IDN?"
+    assert not handle.stale
+    assert len(manager.opened) == 2
+
+
+def test_error_is_raised_after_the_last_attempt(manager):
+    handle = manager.visa.open("USB::1")
+    manager.io_errors = session.RETRY_ATTEMPTS
+    with pytest.raises(VisaIOError):
+        handle.query("*IDN?")
+
+
+def test_nested_calls_are_not_retried_on_their_own(manager, monkeypatch):
+    handle = manager.visa.open("USB::1")
+    replies = []
+    query = FakeResource.query
+
+    # the second query of the first try fails, so the exchange starts again.
+    def second_fails_once(resource, message):
+        if message == "second" and len(manager.opened) == 1:
+            raise VisaIOError(constants.VI_ERROR_TMO)
+        return query(resource, message)
+
+    def exchange():
+        replies.append(handle.query("first"))
+        replies.append(handle.query("second"))
+        return replies[-1]
+
+    monkeypatch.setattr(FakeResource, "query", second_fails_once)
+    assert handle.transaction(exchange) == "reply to second"
+    assert replies == ["reply to first", "reply to first", "reply to second"]
+
+
+def test_abandoned_thread_is_refused(manager):
+    handle = manager.visa.open("USB::1")
+    handle.abort(threading.current_thread())
+    assert handle.stale
+    with pytest.raises(InstrumentAborted):
+        handle.query("*IDN?")
+
+    # any other thread opens the link again.
+    replies = []
+    worker = threading.Thread(target=lambda: replies.append(handle.query("*IDN?")))
+    worker.start()
+    worker.join()
+    assert replies == ["reply to *IDN?"]
+    assert not handle.stale
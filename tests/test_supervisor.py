@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from smponpol import supervisor
+from smponpol.supervisor import AcquisitionFailed, supervise
+
+
+def run(operation, recover=None, **kwargs):
+    events = []
+
+    async def recover_and_log():
+        events.append("recover")
+        if recover is not None:
+            await recover()
+
+    async def main():
+        return await supervise(
+            lambda: operation(events),
+            recover_and_log,
+            abort=lambda: events.append("abort"),
+            **kwargs,
+        )
+
+    try:
+        return asyncio.run(main()), events
+    except AcquisitionFailed as e:
+        return e, events
+
+
+def test_result_of_a_working_operation():
+    async def operation(events):
+        events.append("operation")
+        return 42
+
+    assert run(operation) == (42, ["operation"])
+
+
+def test_error_is_recovered_and_retried():
+    async def operation(events):
+        events.append("operation")
+        if events.count("operation") == 1:
+            raise OSError("no trigger")
+        return 42
+
+    assert run(operation) == (42, ["operation", "recover", "operation"])
+
+
+def test_timeout_aborts_before_recovering():
+    async def operation(events):
+        events.append("operation")
+        if events.count("operation") == 1:
+            await asyncio.sleep(10)
+        return 42
+
+    assert run(operation, deadline=0.01) == (
+        42,
+        ["operation", "abort", "recover", "operation"],
+    )
+
+
+def test_gives_up_after_the_last_attempt():
+    async def operation(events):
+        events.append("operation")
+        raise OSError("no trigger")
+
+    error, events = run(operation, attempts=3)
+    assert isinstance(error, AcquisitionFailed)
+    assert isinstance(error.__cause__, OSError)
+    assert events == ["operation", "recover"] * 3
+
+
+def test_stuck_recovery_is_aborted(monkeypatch):
+    monkeypatch.setattr(supervisor, "RECOVER_DEADLINE", 0.01)
+
+    async def operation(events):
+        events.append("operation")
+        if events.count("operation") == 1:
+            raise OSError("no trigger")
+        return 42
+
+    async def recover():
+        await asyncio.sleep(10)
+
+    assert run(operation, recover) == (
+        42,
+        ["operation", "recover", "abort", "operation"],
+    )
+
+
+def test_cancellation_is_not_retried():
+    async def operation(events):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        run(operation)
@@ -0,0 +1,82 @@
+import pytest
+
+from smponpol.sweep import ResultStore, SweepAxis, SweepPlan
+
+
+def make_plan() -> SweepPlan:
+    return SweepPlan(
+        [SweepAxis("temperature", [25.0, 30.0]), SweepAxis("voltage", [1.0, 2.0, 3.0])],
+        {"frequency": 1000.0},
+    )
+
+
+def test_points_nest_in_declared_order():
+    plan = make_plan()
+    assert len(plan) == 6
+    assert [point.index for point in plan.points[:4]] == [
+        (0, 0),
+        (0, 1),
+        (0, 2),
+        (1, 0),
+    ]
+    assert plan[4].values == {"frequency": 1000.0, "temperature": 30.0, "voltage": 2.0}
+
+
+def test_outermost_axis_is_the_first_declared():
+    plan = SweepPlan([SweepAxis("voltage", [1.0, 2.0]), SweepAxis("temperature", [25.0])])
+    assert [axis.name for axis in plan.axes] == ["voltage", "temperature"]
+    assert plan[1].values == {"voltage": 2.0, "temperature": 25.0}
+
+
+def test_empty_axis_is_rejected():
+    with pytest.raises(ValueError, match="voltage"):
+        SweepPlan([SweepAxis("temperature", [25.0]), SweepAxis("voltage", [])])
+
+
+def test_changed_axes():
+    plan = make_plan()
+    assert plan.changed_axes(0) == {"temperature", "voltage"}
+    assert plan.changed_axes(0, -1) == {"temperature", "voltage"}
+    assert plan.changed_axes(1, 0) == {"voltage"}
+    assert plan.changed_axes(3, 2) == {"temperature", "voltage"}
+    assert plan.changed_axes(3, 0) == {"temperature"}
+
+
+def test_inner_run():
+    plan = make_plan()
+    assert plan.inner_run(0) == [0, 1, 2]
+    assert plan.inner_run(1) == [1, 2]
+    assert plan.inner_run(3) == [3, 4, 5]
+
+
+def test_labels_and_axis_lookup():
+    plan = make_plan()
+    assert plan.labels(plan[5]) == ["2: 30.0", "3: 3.0"]
+    assert plan.axis("voltage").values == [1.0, 2.0, 3.0]
+    assert plan.axis("frequency") is None
+
+
+def test_round_trip_through_dict():
+    plan = make_plan()
+    copy = SweepPlan.from_dict(plan.to_dict())
+    assert copy.to_dict() == plan.to_dict()
+    assert [point.values for point in copy.points] == [
+        point.values for point in plan.points
+    ]
+
+
+def test_result_store_nests_by_label():
+    plan = make_plan()
+    store = ResultStore(plan)
+    store.add(plan[0], {"ps": 1.0})
+    store.add(plan[4], {"ps": 2.0})
+    store.add(plan[5], {"ps": 3.0}, labels=["ramp", "1"])
+
+    assert (0, 0) in store
+    assert (0, 1) not in store
+    assert store[(1, 1)] == {"ps": 2.0}
+    assert store.nested() == {
+        "1: 25.0": {"1: 1.0": {"ps": 1.0}},
+        "2: 30.0": {"2: 2.0": {"ps": 2.0}},
+        "ramp": {"1": {"ps": 3.0}},
+    }
@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+from smponpol.telemetry import TelemetryBuffer, window_statistics
+
+TIMES = [0.0, 1.0, 2.0, 3.0, 4.0]
+TEMPERATURES = [25.0, 25.5, 26.0, 26.5, 27.0]
+
+
+def test_statistics_over_the_window():
+    statistics = window_statistics(TIMES, TEMPERATURES, 1.0, 3.0)
+    assert statistics == {
+        "mean": pytest.approx(26.0),
+        "min": 25.5,
+        "max": 26.5,
+        "drift": 1.0,
+        "samples": 3,
+    }
+
+
+def test_capture_between_samples_uses_the_next_one():
+    statistics = window_statistics(TIMES, TEMPERATURES, 1.2, 1.8)
+    assert statistics["samples"] == 0
+    assert statistics["mean"] == 26.0
+    assert statistics["drift"] == 0.0
+    # after the last sample there is only the last one.
+    assert window_statistics(TIMES, TEMPERATURES, 9.0, 10.0)["mean"] == 27.0
+
+
+def test_no_samples_at_all():
+    statistics = window_statistics([], [], 0.0, 1.0)
+    assert statistics["samples"] == 0
+    assert math.isnan(statistics["mean"])
+
+
+def test_buffer_keeps_the_latest_samples():
+    buffer = TelemetryBuffer(capacity=10)
+    for i in range(25):
+        buffer.append(float(i), 20.0 + i)
+    assert 10 <= len(buffer) <= 20
+    assert buffer.times[-1] == 24.0
+    assert buffer.window(23.0, 24.0)["mean"] == pytest.approx(43.5)
@@ -0,0 +1,53 @@
+import pytest
+
+from smponpol.timebase import (
+    HORIZONTAL_DIVISIONS,
+    MAX_DEPTH,
+    MAX_HOLDOFF,
+    MAX_SAMPLE_RATE,
+    nice_timebase,
+    plan_timebase,
+)
+
+
+@pytest.mark.parametrize(
+    "scale, expected", [(2.857e-4, 5e-4), (5e-4, 5e-4), (1.1e-6, 2e-6), (3e-9, 5e-9)]
+)
+def test_nice_timebase(scale, expected):
+    assert nice_timebase(scale) == expected
+
+
+def test_plan_at_1khz():
+    plan = plan_timebase(1000.0)
+    assert plan.scale == 5e-4
+    assert plan.cycles == pytest.approx(7.0)
+    assert plan.memory_depth == 7000
+    assert plan.samples_per_cycle == pytest.approx(1000.0)
+    # the trigger re-arms just before the fourth period boundary after it.
+    assert plan.holdoff == pytest.approx(3.9e-3)
+    assert plan.trigger_interval == pytest.approx(3.9e-3 + 3.5e-3 + 1e-3)
+
+
+def test_sample_rate_limits_fast_drives():
+    plan = plan_timebase(1e7)
+    screen = plan.scale * HORIZONTAL_DIVISIONS
+    assert plan.memory_depth == 7000
+    assert plan.samples_per_cycle == pytest.approx(MAX_SAMPLE_RATE / 1e7)
+    assert plan.memory_depth / screen >= MAX_SAMPLE_RATE
+
+
+def test_memory_depth_is_capped():
+    assert plan_timebase(1000.0, samples_per_cycle=100000).memory_depth == MAX_DEPTH
+    deep = plan_timebase(1000.0, samples_per_cycle=100000, max_depth=7000000)
+    assert deep.memory_depth == 700000
+
+
+def test_holdoff_is_limited_for_slow_drives():
+    plan = plan_timebase(0.1)
+    assert plan.scale == 5.0
+    assert plan.holdoff == MAX_HOLDOFF
+
+
+def test_frequency_must_be_positive():
+    with pytest.raises(ValueError):
+        plan_timebase(0.0)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from smponpol.trace_history import TraceHistory, decimate
+
+
+def test_short_traces_are_kept_whole():
+    times = np.arange(100.0)
+    kept_times, kept = decimate(times, np.sin(times), points=100)
+    assert len(kept) == 100
+    assert np.allclose(kept, np.sin(times), atol=1e-6)
+
+
+def test_decimation_keeps_the_peaks_in_time_order():
+    times = np.arange(10000.0)
+    data = np.zeros(10000)
+    data[1234] = 5.0
+    data[8765] = -3.0
+    kept_times, kept = decimate(times, data, points=100)
+    assert len(kept) == 100
+    assert kept.max() == 5.0
+    assert kept.min() == -3.0
+    assert np.all(np.diff(kept_times) >= 0)
+    assert kept_times[np.argmax(kept)] == 1234.0
+
+
+def make_result(value: float) -> dict:
+    times = np.arange(5000.0)
+    return {"time": times} | {
+        f"channel{i}": np.full(5000, value * i) for i in (1, 2, 3)
+    }
+
+
+def test_oldest_trace_is_evicted():
+    history = TraceHistory(capacity=2, points=50)
+    history.add(0, "first", make_result(1.0))
+    history.add(1, "second", make_result(2.0))
+    history.add(2, "third", make_result(3.0))
+    assert len(history) == 2
+    labels = [label for label, _, _ in history.recent("channel2")]
+    assert labels == ["second", "third"]
+    _, times, data = history.recent("channel2")[-1]
+    assert len(data) == 50
+    assert np.all(data == 6.0)
+
+
+def test_repeated_point_replaces_and_moves_to_the_end():
+    history = TraceHistory(capacity=2, points=50)
+    history.add(0, "first", make_result(1.0))
+    history.add(1, "second", make_result(2.0))
+    history.add(0, "first again", make_result(1.5))
+    history.add(2, "third", make_result(3.0))
+    labels = [label for label, _, _ in history.recent("channel1")]
+    assert labels == ["first again", "third"]
+
+    history.clear()
+    assert len(history) == 0
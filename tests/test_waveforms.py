@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from smponpol.waveforms import (
+    DAC_MAX,
+    MAX_POINTS,
+    is_generated_name,
+    pulse_train,
+    pund,
+    to_dac,
+    user_waveform,
+    waveform_name,
+)
+
+
+def test_pulse_train_places_one_pulse_per_slot():
+    train = pulse_train([1.0, -0.5], pulse_width=0.2, points=1000)
+    assert len(train) == 1000
+    first, second = train[:500], train[500:]
+    assert first.max() == pytest.approx(1.0, abs=0.01)
+    assert first.min() == 0.0
+    assert second.min() == pytest.approx(-0.5, abs=0.01)
+    # each pulse lasts pulse_width of the period, then rests at 0 V.
+    assert np.count_nonzero(first) == pytest.approx(200, abs=2)
+    assert np.all(first[220:] == 0.0)
+
+
+def test_pulses_must_fit_in_a_period():
+    with pytest.raises(ValueError):
+        pulse_train([1, 1, -1, -1], pulse_width=0.3)
+
+
+def test_pund():
+    assert np.array_equal(pund(0.1, 800), pulse_train([1, 1, -1, -1], 0.1, 800))
+
+
+def test_user_waveform_is_full_scale_dac_codes():
+    dac = user_waveform("Bipolar pulses", pulse_width=0.8, points=400)
+    assert dac.dtype == np.dtype("<i2")
+    assert dac.max() == pytest.approx(DAC_MAX, abs=100)
+    assert dac.min() == pytest.approx(-DAC_MAX, abs=100)
+    assert np.abs(dac).max() == DAC_MAX
+
+
+def test_to_dac():
+    assert list(to_dac([0.0, 0.5, -1.0])) == [0, round(DAC_MAX / 2), -DAC_MAX]
+    assert list(to_dac([0.0, 0.0])) == [0, 0]
+    with pytest.raises(ValueError):
+        to_dac([1.0])
+    with pytest.raises(ValueError):
+        to_dac(np.zeros(MAX_POINTS + 1))
+
+
+def test_waveform_names():
+    dac = user_waveform("PUND")
+    name = waveform_name(dac)
+    assert len(name) == 12
+    assert name == waveform_name(dac.copy())
+    assert name != waveform_name(user_waveform("Bipolar pulses"))
+    assert is_generated_name(name)
+
+
+@pytest.mark.parametrize("name", ["MYPULSE", "ARB123", "ARB0123456789", "arb0123456ab"])
+def test_other_names_are_not_generated(name):
+    assert not is_generated_name(name)